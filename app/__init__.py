@@ -1,5 +1,4 @@
 from fastapi import FastAPI, APIRouter
-from fastapi.staticfiles import StaticFiles
 
 from app.db import init_db
 from app import constants
@@ -20,7 +19,7 @@ fastapi_openapi_utils.generate_operation_summary = generate_operation_summary
 
 
 main_app: FastAPI = FastAPI(
-    debug = True,
+    debug = config.server.debug,
     docs_url = None,
     redoc_url = None
 )
@@ -28,33 +27,62 @@ main_app: FastAPI = FastAPI(
 
 STARTUP_COROS: List[Awaitable] = [
     init_db(
-        db_uri = config.db.uri,
-        db_name = config.db.name
+        db_config = config.db
     )
 ]
 
 
+SHUTDOWN_COROS: List[Awaitable] = []
+
+
 @main_app.on_event("startup")
 async def main_app_on_startup() -> None:
     for coro in STARTUP_COROS:
         await coro
 
 
+@main_app.on_event("shutdown")
+async def main_app_on_shutdown() -> None:
+    for coro in SHUTDOWN_COROS:
+        await coro
+
+
 def setup_app() -> None:
-    from app import main, api
+    from app import main, api, metrics
+    from app.static_assets import static_assets
 
     main.mount(
         app = main_app
     )
 
+    if config.metrics.enabled:
+        metrics.mount(
+            app = main_app
+        )
+
+        for app in (main_app, api.api_app):
+            metrics.install_metrics(
+                app = app
+            )
+
     main_app.mount(
         path = "/api",
         app = api.api_app
     )
 
+    static_assets.build()
+
+    constants.templates.env.globals["static_url"] = static_assets.url_for
+
     main_app.mount(
         path = "/static",
-        app = StaticFiles(
-            directory = constants.parent_dirpath / "static"
-        )
+        app = static_assets
     )
+
+
+def create_app() -> FastAPI:
+    """App factory for uvicorn workers: every worker process builds the app, and its DB client on startup."""
+
+    setup_app()
+
+    return main_app
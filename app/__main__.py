@@ -1,14 +1,138 @@
-from uvicorn import run as run_uvicorn
+from argparse import ArgumentParser, Namespace
+from uvicorn import run as run_uvicorn, Config as UvicornConfig, Server as UvicornServer
+from multiprocessing import get_context
+from multiprocessing.process import BaseProcess
+from socket import socket, AF_INET, AF_INET6, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
+from signal import signal, SIGINT, SIGTERM
+from os import cpu_count
 
-from app import main_app, setup_app
 from app.config import config
 
+from typing import Any, Dict, List, Optional
 
-setup_app()
 
+APP_FACTORY: str = "app:create_app"
 
-run_uvicorn(
-    app = main_app,
-    host = config.host,
-    port = config.port
-)
+
+def get_workers_count() -> int:
+    return config.server.workers or cpu_count() or 1
+
+
+def get_uvicorn_options() -> Dict[str, Any]:
+    return {
+        "host": config.host,
+        "port": config.port,
+        "loop": config.server.loop,
+        "http": config.server.http,
+        "backlog": config.server.backlog,
+        "timeout_keep_alive": config.server.timeout_keep_alive,
+        "timeout_graceful_shutdown": config.server.timeout_graceful_shutdown,
+        "access_log": config.server.access_log
+    }
+
+
+def run_reuse_port_worker(uvicorn_options: Dict[str, Any]) -> None:
+    from socket import SO_REUSEPORT
+
+    sock: socket = socket(AF_INET6 if ":" in uvicorn_options["host"] else AF_INET, SOCK_STREAM)
+    sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+    sock.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+    sock.bind((uvicorn_options["host"], uvicorn_options["port"]))
+
+    UvicornServer(
+        UvicornConfig(
+            app = APP_FACTORY,
+            factory = True,
+            **uvicorn_options
+        )
+    ).run(
+        sockets = [
+            sock
+        ]
+    )
+
+
+def run_reuse_port_workers(workers_count: int, uvicorn_options: Dict[str, Any]) -> None:
+    """Runs every worker on its own SO_REUSEPORT socket, so that the kernel balances connections."""
+
+    # Spawned workers share nothing with this process, the DB client included
+    context = get_context("spawn")
+
+    processes: List[BaseProcess] = [
+        context.Process(
+            target = run_reuse_port_worker,
+            args = (
+                uvicorn_options,
+            ),
+            name = f"pyblog-worker-{index}"
+        )
+        for index in range(workers_count)
+    ]
+
+    def stop_workers(signum: int, frame: Any) -> None:
+        # Workers drain their in-flight requests on SIGTERM
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal(SIGINT, stop_workers)
+    signal(SIGTERM, stop_workers)
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+
+def print_multi_worker_warnings() -> None:
+    if config.response_cache.backend == "memory":
+        print("Warning: the memory response cache is per worker and is not invalidated across workers, use the redis backend.")
+
+    if config.events.source == "local":
+        print("Warning: local feed events only reach clients of the same worker, use the change_stream source.")
+
+
+def parse_args(argv: Optional[List[str]]=None) -> Namespace:
+    parser: ArgumentParser = ArgumentParser(
+        prog = "python -m app",
+        description = "Serves the app with the settings of config.yml."
+    )
+
+    parser.add_argument("--workers", type=int, default=None, help="overrides server.workers, 0 for one per CPU core")
+    parser.add_argument("--port", type=int, default=None, help="overrides port")
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from app.static_assets import static_assets
+
+    args: Namespace = parse_args()
+
+    if args.workers is not None:
+        config.server.workers = args.workers
+
+    if args.port is not None:
+        config.port = args.port
+
+    # Precompress once here, so that workers starting together find the siblings up to date
+    static_assets.build()
+
+    workers_count: int = get_workers_count()
+    uvicorn_options: Dict[str, Any] = get_uvicorn_options()
+
+    if workers_count > 1:
+        print_multi_worker_warnings()
+
+    if workers_count > 1 and config.server.reuse_port:
+        run_reuse_port_workers(workers_count, uvicorn_options)
+
+    else:
+        # With several workers uvicorn binds one socket and spawns workers that accept from it
+        run_uvicorn(
+            app = APP_FACTORY,
+            factory = True,
+            workers = workers_count,
+            **uvicorn_options
+        )
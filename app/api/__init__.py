@@ -1,9 +1,10 @@
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI
 
 from app.api import auth, posts
 from app.auth_backend import fastapi_users
 from app.schemas import UserRead, UserUpdate
 from app.config import config
+from app.uploads import RequestBodyLimitMiddleware, MULTIPART_OVERHEAD_SIZE
 
 
 api_app: FastAPI = FastAPI(
@@ -14,11 +15,36 @@ api_app: FastAPI = FastAPI(
 )
 
 
-api_app.routes.append(
-    fastapi_users.get_users_router(
-        user_schema = UserRead,
-        user_update_schema = UserUpdate
-    ).routes[0]
+api_app.add_middleware(
+    RequestBodyLimitMiddleware,
+    max_size = config.user_limits.preview_image_size + MULTIPART_OVERHEAD_SIZE
+)
+
+
+users_router: APIRouter = fastapi_users.get_users_router(
+    user_schema = UserRead,
+    user_update_schema = UserUpdate
+)
+
+# GET and PATCH /me stay at the API root; the superuser routes for other users go under /users
+api_app.routes.extend(
+    route
+    for route in users_router.routes
+    if route.path == "/me"
+)
+
+api_app.include_router(
+    router = APIRouter(
+        routes = [
+            route
+            for route in users_router.routes
+            if route.path != "/me"
+        ]
+    ),
+    prefix = "/users",
+    tags = [
+        "users"
+    ]
 )
 
 
@@ -1,72 +1,548 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Query, Request, Response, status, HTTPException
+from fastapi.responses import StreamingResponse
 
 from pathlib import Path
 from beanie import PydanticObjectId
-from uuid import uuid4
-from shutil import copyfileobj
+from motor.motor_asyncio import AsyncIOMotorCursor
+from beanie.operators import Inc, Set
+from hashlib import sha1
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from bson.errors import InvalidId
+from pymongo import DESCENDING
 
 from app.auth_backend import depends_current_active_user, UserManager, get_user_manager, get_user_db
-from app.db import User, Post, PostReaction
-from app import STARTUP_COROS, constants, errors, schemas
+from app.db import User, Post, PostReaction, PostListView, PostValidatorsView, get_feed_motor_collection, get_projection, get_post_list_projection
+from app import STARTUP_COROS, SHUTDOWN_COROS, constants, errors, schemas, reactions
 from app.config import config
+from app.authors import get_authors_usernames, get_author_id
+from app.response_cache import CachedResponse, response_cache, build_cache_key, get_post_cache_tag, get_author_cache_tag, POSTS_LIST_CACHE_TAG
+from app.utils import get_timestamp, encode_cursor, decode_cursor
+from app.media import media_store
+from app.images import image_pipeline
+from app.events import event_hub, build_post_created_event, build_post_edited_event
+from app.reactions_buffer import reactions_buffer
+from app.serialization import build_model, build_model_response, dump_model_json
 
-from typing import Union, Optional, Dict, Tuple, List
+from typing import Any, Union, Optional, Dict, Tuple, List
 
 
 router: APIRouter = APIRouter()
 
-STATIC_POSTS_DIRPATH: Path = constants.parent_dirpath / "static" / "posts"
+STATIC_POSTS_DIRPATH: Path = constants.static_posts_dirpath
 
 if not STATIC_POSTS_DIRPATH.is_dir():
     STATIC_POSTS_DIRPATH.mkdir()
 
+POSTS_FEED_SORT: List[Tuple[str, int]] = [
+    ("is_pinned", DESCENDING),
+    ("created_at", DESCENDING),
+    ("_id", DESCENDING)
+]
+
+# Author and time range views leave pinning to the main feed
+FILTERED_POSTS_SORT: List[Tuple[str, int]] = [
+    ("created_at", DESCENDING),
+    ("_id", DESCENDING)
+]
+
+SEARCH_QUERY_MAX_LENGTH: int = 256
+
+POSTS_LIST_PROJECTION: Dict[str, Any] = get_post_list_projection(
+    preview_length = config.api_posts_preview_length
+)
+
 user_manager: UserManager
 
 
-async def parse_post_read_model(post: Post, known_authors: Optional[Dict[PydanticObjectId, str]]=None) -> Union[Tuple[Union[schemas.PostRead, None], Dict[PydanticObjectId, str]], Union[schemas.PostRead, None]]:
-    author_id: PydanticObjectId = post.author_id
-    author_username: str
+def encode_posts_cursor(post: Union[Post, PostListView], is_filtered: bool=False) -> str:
+    if is_filtered:
+        return encode_cursor([
+            post.created_at,
+            str(post.id)
+        ])
+
+    return encode_cursor([
+        post.is_pinned,
+        post.created_at,
+        str(post.id)
+    ])
+
+
+def is_cursor_int(value: Any) -> bool:
+    # Cursor values end up in the query, so anything but the encoded types (a dict with operators included) is refused
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_posts_cursor(cursor: str) -> dict:
+    try:
+        is_pinned, created_at, post_id = decode_cursor(cursor)
+
+        if not isinstance(is_pinned, bool) or not is_cursor_int(created_at) or not isinstance(post_id, str):
+            raise TypeError("Invalid cursor value types")
+
+        post_id = PydanticObjectId(post_id)
+
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST,
+            detail = errors.ErrorStrings.INVALID_CURSOR
+        )
+
+    return {
+        "$or": [
+            {
+                "is_pinned": {
+                    "$lt": is_pinned
+                }
+            },
+            {
+                "is_pinned": is_pinned,
+                "created_at": {
+                    "$lt": created_at
+                }
+            },
+            {
+                "is_pinned": is_pinned,
+                "created_at": created_at,
+                "_id": {
+                    "$lt": post_id
+                }
+            }
+        ]
+    }
+
+
+def decode_filtered_posts_cursor(cursor: str) -> dict:
+    try:
+        created_at, post_id = decode_cursor(cursor)
+
+        if not is_cursor_int(created_at) or not isinstance(post_id, str):
+            raise TypeError("Invalid cursor value types")
+
+        post_id = PydanticObjectId(post_id)
+
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST,
+            detail = errors.ErrorStrings.INVALID_CURSOR
+        )
+
+    return {
+        "$or": [
+            {
+                "created_at": {
+                    "$lt": created_at
+                }
+            },
+            {
+                "created_at": created_at,
+                "_id": {
+                    "$lt": post_id
+                }
+            }
+        ]
+    }
+
+
+def build_posts_filter(
+    author_id: Optional[PydanticObjectId]=None,
+    created_after: Optional[int]=None,
+    created_before: Optional[int]=None
+) -> dict:
+    posts_filter: dict = {}
+
+    if author_id is not None:
+        posts_filter["author_id"] = author_id
+
+    if created_after is not None or created_before is not None:
+        posts_filter["created_at"] = {
+            operator: value
+            for operator, value in (
+                ("$gte", created_after),
+                ("$lt", created_before)
+            )
+            if value is not None
+        }
+
+    return posts_filter
+
+
+def encode_search_cursor(post_data: dict) -> str:
+    return encode_cursor([
+        post_data["score"],
+        str(post_data["_id"])
+    ])
+
+
+def decode_search_cursor(cursor: str) -> dict:
+    try:
+        score, post_id = decode_cursor(cursor)
+
+        if not (is_cursor_int(score) or isinstance(score, float)) or not isinstance(post_id, str):
+            raise TypeError("Invalid cursor value types")
+
+        score = float(score)
+        post_id = PydanticObjectId(post_id)
+
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST,
+            detail = errors.ErrorStrings.INVALID_CURSOR
+        )
+
+    return {
+        "$or": [
+            {
+                "score": {
+                    "$lt": score
+                }
+            },
+            {
+                "score": score,
+                "_id": {
+                    "$lt": post_id
+                }
+            }
+        ]
+    }
+
+
+async def parse_post_read_models(posts: List[Union[Post, PostListView]]) -> List[schemas.PostRead]:
+    if not posts:
+        return []
+
+    known_authors: Dict[PydanticObjectId, str] = await get_authors_usernames(
+        author_ids = (
+            post.author_id
+            for post in posts
+        )
+    )
+
+    return [
+        build_model(
+            schemas.PostRead,
+            id = post.id,
+            title = post.title,
+            content = post.content,
+            is_content_truncated = getattr(post, "is_content_truncated", False),
+            preview_image_url = (
+                f"/static/posts/{post.preview_image_path}"
+                if post.preview_image_path
+                else
+                None
+            ),
+            preview_image_variants_urls = (
+                {
+                    variant: f"/static/posts/{post.preview_image_variants.get(variant, post.preview_image_path)}"
+                    for variant in config.images.variants
+                }
+                if post.preview_image_path
+                else
+                {}
+            ),
+            author = build_model(
+                schemas.PostAuthorRead,
+                id = post.author_id,
+                username = known_authors.get(post.author_id)
+            ),
+            is_pinned = post.is_pinned,
+            edited_at = post.edited_at,
+            created_at = post.created_at,
+            reactions = {
+                reaction: post.reactions.get(reaction, 0)
+                for reaction in config.reactions_list
+            }
+        )
+        for post in posts
+    ]
+
+
+async def parse_post_read_model(post: Post) -> schemas.PostRead:
+    return (
+        await parse_post_read_models(
+            posts = [
+                post
+            ]
+        )
+    )[0]
+
+
+def get_posts_cache_tags(post_reads: List[schemas.PostRead]) -> List[str]:
+    return [
+        tag
+        for post_read in post_reads
+        for tag in (
+            get_post_cache_tag(post_read.id),
+            get_author_cache_tag(post_read.author.id)
+        )
+    ]
+
+
+def get_posts_validators(posts: List[Union[Post, PostListView, PostValidatorsView]]) -> Dict[str, str]:
+    etag_hash = sha1()
+
+    for post in posts:
+        etag_hash.update(f"{post.id}:{post.version};".encode("ascii"))
+
+    validators: Dict[str, str] = {
+        "ETag": f"W/\"{etag_hash.hexdigest()}\""
+    }
+
+    if posts:
+        validators["Last-Modified"] = format_datetime(
+            datetime.fromtimestamp(
+                max(
+                    post.updated_at or post.edited_at or post.created_at
+                    for post in posts
+                ),
+                timezone.utc
+            ),
+            usegmt = True
+        )
+
+    return validators
+
+
+def is_not_modified(request: Request, validators: Dict[str, str]) -> bool:
+    if_none_match: Union[str, None] = request.headers.get("if-none-match")
+
+    if if_none_match is not None:
+        return (
+            if_none_match.strip() == "*"
+            or
+            validators["ETag"] in (
+                etag.strip()
+                for etag in if_none_match.split(",")
+            )
+        )
+
+    if_modified_since: Union[str, None] = request.headers.get("if-modified-since")
+
+    if if_modified_since is None or "Last-Modified" not in validators:
+        return False
+
+    try:
+        return parsedate_to_datetime(validators["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+
+    except (TypeError, ValueError):
+        return False
+
+
+def build_posts_query(
+    offset: int,
+    limit: int,
+    cursor: Optional[str],
+    posts_filter: Optional[dict]=None,
+    projection: Optional[dict]=None
+) -> AsyncIOMotorCursor:
+    """Builds a page of the main feed, or of a filtered view when `posts_filter` is not empty.
+
+    Filtered views are ordered by `created_at` only, so that `author_feed_index` and
+    `created_at_index` serve both the filter and the keyset. Pages are read with `db.feed_read_preference`.
+    """
+
+    if cursor:
+        cursor_filter: dict = (
+            decode_filtered_posts_cursor(
+                cursor = cursor
+            )
+            if posts_filter
+            else
+            decode_posts_cursor(
+                cursor = cursor
+            )
+        )
 
-    if known_authors and author_id in known_authors:
-        author_username = known_authors[author_id]
+        query: dict = (
+            {
+                "$and": [
+                    posts_filter,
+                    cursor_filter
+                ]
+            }
+            if posts_filter
+            else
+            cursor_filter
+        )
 
     else:
-        author_username = (
-            await user_manager.get(author_id)
-        ).username
-
-        if known_authors:
-            known_authors[author_id] = author_username
-
-    post_read: schemas.PostRead = schemas.PostRead(
-        id = post.id,
-        title = post.title,
-        content = post.content,
-        preview_image_url = (
-            f"/static/posts/{post.preview_image_path}"
-            if post.preview_image_path
+        query = posts_filter or {}
+
+    posts_query: AsyncIOMotorCursor = get_feed_motor_collection(Post).find(
+        query,
+        projection
+    ).sort(
+        FILTERED_POSTS_SORT
+        if posts_filter
+        else
+        POSTS_FEED_SORT
+    )
+
+    if not cursor:
+        posts_query = posts_query.skip(offset)
+
+    return posts_query.limit(limit)
+
+
+async def process_post_preview_image(post_id: PydanticObjectId, preview_image_path: str) -> None:
+    try:
+        preview_image_variants: Dict[str, str] = await image_pipeline.render(
+            source_filepath = media_store.dirpath / preview_image_path
+        )
+
+    except Exception as ex:
+        print(f"Failed to process preview image {preview_image_path} of post {post_id}: {ex!r}")
+        return
+
+    result = await Post.find_one(
+        Post.id == post_id,
+        Post.preview_image_path == preview_image_path
+    ).update(
+        Set({
+            Post.preview_image_variants: preview_image_variants,
+            Post.updated_at: get_timestamp()
+        }),
+        Inc({
+            Post.version: 1
+        })
+    )
+
+    if not result.modified_count:
+        return
+
+    await response_cache.invalidate_tags([
+        get_post_cache_tag(post_id)
+    ])
+
+    event_hub.publish_local(
+        build_post_edited_event(
+            post_id = post_id
+        )
+    )
+
+
+def schedule_post_preview_image_processing(post: Post) -> None:
+    if post.preview_image_path and image_pipeline.can_process(media_store.dirpath / post.preview_image_path):
+        image_pipeline.schedule(
+            process_post_preview_image(
+                post_id = post.id,
+                preview_image_path = post.preview_image_path
+            )
+        )
+
+
+def get_post_read_list_cache_tags(post_read_list: schemas.PostReadList) -> List[str]:
+    return [
+        POSTS_LIST_CACHE_TAG,
+        *get_posts_cache_tags(
+            post_reads = post_read_list.posts
+        )
+    ]
+
+
+async def get_post_read_list(
+    offset: int,
+    limit: int,
+    cursor: Optional[str],
+    posts_filter: Optional[dict]=None
+) -> Tuple[schemas.PostReadList, List[PostListView]]:
+    posts: List[PostListView] = [
+        PostListView.parse_obj(post_data)
+        async for post_data in build_posts_query(
+            offset = offset,
+            limit = limit,
+            cursor = cursor,
+            posts_filter = posts_filter,
+            projection = POSTS_LIST_PROJECTION
+        )
+    ]
+
+    post_read_list: schemas.PostReadList = build_model(
+        schemas.PostReadList,
+        posts = await parse_post_read_models(
+            posts = posts
+        ),
+        next_cursor = (
+            encode_posts_cursor(
+                post = posts[-1],
+                is_filtered = bool(posts_filter)
+            )
+            if posts and len(posts) == limit
             else
             None
-        ),
-        author = schemas.PostAuthorRead(
-            id = author_id,
-            username = author_username
-        ),
-        edited_at = post.edited_at,
-        created_at = post.created_at,
-        reactions = {
-            reaction: await PostReaction.find(
-                PostReaction.post_id == post.id,
-                PostReaction.reaction == reaction
-            ).count()
-            for reaction in config.reactions_list
-        }
+        )
     )
 
-    if isinstance(known_authors, dict):
-        return post_read, known_authors
+    return post_read_list, posts
+
+
+async def search_post_read_list(query: str, limit: int, cursor: Optional[str]) -> schemas.PostReadList:
+    """Ranks posts by text score of `search_index`, newest first among equal scores."""
+
+    pipeline: List[dict] = [
+        {
+            "$match": {
+                "$text": {
+                    "$search": query
+                }
+            }
+        },
+        {
+            "$addFields": {
+                "score": {
+                    "$meta": "textScore"
+                }
+            }
+        }
+    ]
 
-    return post_read
+    if cursor:
+        pipeline.append({
+            "$match": decode_search_cursor(
+                cursor = cursor
+            )
+        })
+
+    pipeline.extend([
+        {
+            "$sort": {
+                "score": DESCENDING,
+                "_id": DESCENDING
+            }
+        },
+        {
+            "$limit": limit
+        },
+        {
+            "$project": {
+                **POSTS_LIST_PROJECTION,
+                "score": 1
+            }
+        }
+    ])
+
+    posts_data: List[dict] = await get_feed_motor_collection(Post).aggregate(pipeline).to_list(
+        length = limit
+    )
+
+    return build_model(
+        schemas.PostReadList,
+        posts = await parse_post_read_models(
+            posts = [
+                PostListView.parse_obj(post_data)
+                for post_data in posts_data
+            ]
+        ),
+        next_cursor = (
+            encode_search_cursor(
+                post_data = posts_data[-1]
+            )
+            if posts_data and len(posts_data) == limit
+            else
+            None
+        )
+    )
 
 
 async def on_startup() -> None:
@@ -83,6 +559,14 @@ async def on_startup() -> None:
     ][0]
 
 STARTUP_COROS.append(on_startup())
+STARTUP_COROS.append(media_store.start())
+STARTUP_COROS.append(image_pipeline.start())
+STARTUP_COROS.append(event_hub.start())
+STARTUP_COROS.append(reactions_buffer.start())
+SHUTDOWN_COROS.append(image_pipeline.shutdown())
+SHUTDOWN_COROS.append(media_store.shutdown())
+SHUTDOWN_COROS.append(event_hub.shutdown())
+SHUTDOWN_COROS.append(reactions_buffer.shutdown())
 
 
 @router.get(
@@ -91,50 +575,235 @@ STARTUP_COROS.append(on_startup())
     summary = "Show one post"
 )
 async def get_single_post_route(
+    request: Request,
     post_id: schemas.Id
-) -> schemas.PostRead:
-    post: Union[Post, None] = await Post.get(post_id)
+) -> Response:
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        post_validators: Union[PostValidatorsView, None] = await Post.find_one(
+            Post.id == post_id,
+            projection_model = PostValidatorsView
+        )
 
-    if not post:
-        raise HTTPException(
-            status_code = status.HTTP_404_NOT_FOUND,
-            detail = errors.ErrorStrings.POST_NOT_FOUND
+        if post_validators:
+            validators: Dict[str, str] = get_posts_validators(
+                posts = [
+                    post_validators
+                ]
+            )
+
+            if is_not_modified(request, validators):
+                return Response(
+                    status_code = status.HTTP_304_NOT_MODIFIED,
+                    headers = validators
+                )
+
+    cache_key: str = build_cache_key(
+        route = "posts:single",
+        post_id = post_id
+    )
+
+    cached_response: Union[CachedResponse, None] = await response_cache.get(cache_key)
+
+    if cached_response is None:
+        cache_generation: int = await response_cache.get_generation()
+
+        post: Union[Post, None] = await Post.get(post_id)
+
+        if not post:
+            raise HTTPException(
+                status_code = status.HTTP_404_NOT_FOUND,
+                detail = errors.ErrorStrings.POST_NOT_FOUND
+            )
+
+        post_read: schemas.PostRead = await parse_post_read_model(
+            post = post
         )
 
-    return await parse_post_read_model(
-        post = post
+        cached_response = CachedResponse(
+            content = dump_model_json(post_read),
+            headers = get_posts_validators(
+                posts = [
+                    post
+                ]
+            )
+        )
+
+        await response_cache.set(
+            key = cache_key,
+            value = cached_response,
+            tags = get_posts_cache_tags(
+                post_reads = [
+                    post_read
+                ]
+            ),
+            generation = cache_generation
+        )
+
+    return Response(
+        content = cached_response.content,
+        headers = cached_response.headers,
+        media_type = "application/json"
     )
 
 
 @router.get(
     path = "/list",
     response_model = schemas.PostReadList,
-    summary = "Show list of posts"
+    summary = "Show list of posts",
+    responses = {
+        **errors.ErrorResponses.INVALID_CURSOR,
+        **errors.ErrorResponses.USER_NOT_FOUND
+    }
 )
 async def get_list_posts_route(
+    request: Request,
     offset: int = 0,
-    limit: int = 0
-) -> schemas.PostReadList:
+    limit: int = 0,
+    cursor: Optional[str] = None,
+    author_id: Optional[schemas.Id] = None,
+    username: Optional[str] = None,
+    created_after: Optional[int] = None,
+    created_before: Optional[int] = None
+) -> Response:
     if limit == 0:
         limit = config.api_posts_limit
 
-    post_read_list: List[schemas.PostRead] = []
-    known_authors: Dict[PydanticObjectId, str] = {}
+    limit = min(limit, config.api_posts_limit)
+
+    if username is not None:
+        username_author_id: Union[PydanticObjectId, None] = await get_author_id(username)
+
+        if username_author_id is None or (author_id is not None and author_id != username_author_id):
+            raise HTTPException(
+                status_code = status.HTTP_404_NOT_FOUND,
+                detail = errors.ErrorStrings.USER_NOT_FOUND
+            )
+
+        author_id = username_author_id
+
+    posts_filter: dict = build_posts_filter(
+        author_id = author_id,
+        created_after = created_after,
+        created_before = created_before
+    )
+
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        validators: Dict[str, str] = get_posts_validators(
+            posts = [
+                PostValidatorsView.parse_obj(post_data)
+                async for post_data in build_posts_query(
+                    offset = offset,
+                    limit = limit,
+                    cursor = cursor,
+                    posts_filter = posts_filter,
+                    projection = get_projection(PostValidatorsView)
+                )
+            ]
+        )
+
+        if is_not_modified(request, validators):
+            return Response(
+                status_code = status.HTTP_304_NOT_MODIFIED,
+                headers = validators
+            )
+
+    cache_key: str = build_cache_key(
+        route = "posts:list",
+        offset = None if cursor else offset,
+        limit = limit,
+        cursor = cursor,
+        author_id = author_id,
+        created_after = created_after,
+        created_before = created_before
+    )
+
+    cached_response: Union[CachedResponse, None] = await response_cache.get(cache_key)
+
+    if cached_response is None:
+        cache_generation: int = await response_cache.get_generation()
+
+        post_read_list, posts = await get_post_read_list(
+            offset = offset,
+            limit = limit,
+            cursor = cursor,
+            posts_filter = posts_filter
+        )
+
+        cached_response = CachedResponse(
+            content = dump_model_json(post_read_list),
+            headers = get_posts_validators(
+                posts = posts
+            )
+        )
+
+        await response_cache.set(
+            key = cache_key,
+            value = cached_response,
+            tags = get_post_read_list_cache_tags(
+                post_read_list = post_read_list
+            ),
+            generation = cache_generation
+        )
+
+    return Response(
+        content = cached_response.content,
+        headers = cached_response.headers,
+        media_type = "application/json"
+    )
+
 
-    for post in await Post.find_all().skip(
-        n = offset
-    ).limit(
-        n = min(limit, config.api_posts_limit)
-    ).to_list():
-        post_read, known_authors = await parse_post_read_model(
-            post = post,
-            known_authors = known_authors
+@router.get(
+    path = "/search",
+    response_model = schemas.PostReadList,
+    summary = "Search posts",
+    responses = {
+        **errors.ErrorResponses.INVALID_CURSOR
+    }
+)
+async def search_posts_route(
+    query: str = Query(
+        alias = "q",
+        min_length = 1,
+        max_length = SEARCH_QUERY_MAX_LENGTH
+    ),
+    limit: int = 0,
+    cursor: Optional[str] = None
+) -> Response:
+    if limit <= 0:
+        limit = config.api_posts_limit
+
+    return build_model_response(
+        await search_post_read_list(
+            query = query,
+            limit = min(limit, config.api_posts_limit),
+            cursor = cursor
         )
+    )
 
-        post_read_list.append(post_read)
 
-    return schemas.PostReadList(
-        posts = post_read_list
+@router.get(
+    path = "/stream",
+    response_class = StreamingResponse,
+    summary = "Stream feed updates",
+    responses = {
+        200: {
+            "content": {
+                "text/event-stream": {}
+            },
+            "description": "Server-Sent Events: `post_created`, `post_edited`, `reactions_changed` and `reset`."
+        }
+    }
+)
+async def stream_posts_route() -> StreamingResponse:
+    return StreamingResponse(
+        content = event_hub.stream(
+            subscription = event_hub.subscribe()
+        ),
+        media_type = "text/event-stream",
+        headers = {
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
     )
 
 
@@ -144,13 +813,14 @@ async def get_list_posts_route(
     summary = "Create new post",
     responses = {
         **errors.ErrorResponses.USER_AUTH,
-        **errors.ErrorResponses.INVALID_CONTENT_TYPE
+        **errors.ErrorResponses.INVALID_CONTENT_TYPE,
+        **errors.ErrorResponses.FILE_TOO_LARGE
     }
 )
 async def create_post_route(
     user: User = depends_current_active_user,
     post_create: schemas.PostCreate = Depends()
-) -> schemas.PostRead:
+) -> Response:
     preview_image_path: Union[str, None] = None
 
     if post_create.preview_image:
@@ -162,10 +832,11 @@ async def create_post_route(
                 detail = errors.ErrorStrings.INVALID_CONTENT_TYPE
             )
 
-        preview_image_path: str = f"{uuid4()}.{extension}"
-
-        with (STATIC_POSTS_DIRPATH / preview_image_path).open("wb") as file:
-            copyfileobj(post_create.preview_image.file, file)
+        preview_image_path: str = await media_store.store(
+            upload_file = post_create.preview_image,
+            extension = extension,
+            max_size = config.user_limits.preview_image_size
+        )
 
     post: Post = Post(
         title = post_create.title,
@@ -174,12 +845,38 @@ async def create_post_route(
         author_id = user.id
     )
 
-    await post.insert()
+    try:
+        await post.insert()
+
+    except BaseException:
+        # The stored file took a reference that no post will ever release
+        if preview_image_path:
+            await media_store.release(
+                filename = preview_image_path
+            )
+
+        raise
+
+    await response_cache.invalidate_tags([
+        POSTS_LIST_CACHE_TAG
+    ])
 
-    return await parse_post_read_model(
+    event_hub.publish_local(
+        build_post_created_event(
+            post_id = post.id
+        )
+    )
+
+    schedule_post_preview_image_processing(
         post = post
     )
 
+    return build_model_response(
+        await parse_post_read_model(
+            post = post
+        )
+    )
+
 
 @router.patch(
     path = "/single",
@@ -187,13 +884,17 @@ async def create_post_route(
     summary = "Update post",
     responses = {
         **errors.ErrorResponses.USER_AUTH,
-        **errors.ErrorResponses.INVALID_CONTENT_TYPE
+        **errors.ErrorResponses.POST_NOT_FOUND,
+        **errors.ErrorResponses.POST_FORBIDDEN,
+        **errors.ErrorResponses.POST_EDIT_CONFLICT,
+        **errors.ErrorResponses.INVALID_CONTENT_TYPE,
+        **errors.ErrorResponses.FILE_TOO_LARGE
     }
 )
 async def update_post_route(
     user: User = depends_current_active_user,
     post_update: schemas.PostUpdate = Depends()
-) -> schemas.PostRead:
+) -> Response:
     post: Union[Post, None] = await Post.get(post_update.post_id)
 
     if not post:
@@ -202,6 +903,13 @@ async def update_post_route(
             detail = errors.ErrorStrings.POST_NOT_FOUND
         )
 
+    # Posts are edited in place, so only their author (or a superuser) may change them
+    if post.author_id != user.id and not user.is_superuser:
+        raise HTTPException(
+            status_code = status.HTTP_403_FORBIDDEN,
+            detail = errors.ErrorStrings.POST_FORBIDDEN
+        )
+
     preview_image_path: Union[str, None] = None
 
     if post_update.preview_image:
@@ -213,31 +921,103 @@ async def update_post_route(
                 detail = errors.ErrorStrings.INVALID_CONTENT_TYPE
             )
 
-        if post_update.delete_old_preview_image:
-            if post.preview_image_path:
-                (STATIC_POSTS_DIRPATH / post.preview_image_path).unlink()
-            else:
-                raise HTTPException(
-                    status_code = status.HTTP_400_BAD_REQUEST,
-                    detail = "INVALID_ARGUMENT - preview_image_path" # TODO
-                )
+        if post_update.delete_old_preview_image and not post.preview_image_path:
+            raise HTTPException(
+                status_code = status.HTTP_400_BAD_REQUEST,
+                detail = "INVALID_ARGUMENT - preview_image_path" # TODO
+            )
 
-        preview_image_path: str = f"{uuid4()}.{extension}"
+        preview_image_path: str = await media_store.store(
+            upload_file = post_update.preview_image,
+            extension = extension,
+            max_size = config.user_limits.preview_image_size
+        )
 
-        with (STATIC_POSTS_DIRPATH / preview_image_path).open("wb") as file:
-            copyfileobj(post_update.preview_image.file, file)
+    post.title = post_update.title
+    post.content = post_update.content
+    post.edited_at = get_timestamp()
+    post.updated_at = post.edited_at
+    post.version += 1
 
-    post: Post = Post(
-        title = post_update.title,
-        content = post_update.content,
-        preview_image_path = preview_image_path,
-        author_id = user.id
+    old_preview_image_path: Union[str, None] = post.preview_image_path
+
+    if preview_image_path:
+        post.preview_image_path = preview_image_path
+        post.preview_image_variants = {}
+
+    post_query: List[Any] = [
+        Post.id == post.id
+    ]
+
+    post_changes: dict = {
+        Post.title: post.title,
+        Post.content: post.content,
+        Post.edited_at: post.edited_at,
+        Post.updated_at: post.updated_at
+    }
+
+    # Left alone otherwise, a background render may have written the variants since the post was read
+    if preview_image_path:
+        post_changes[Post.preview_image_path] = post.preview_image_path
+        post_changes[Post.preview_image_variants] = post.preview_image_variants
+
+        # Only the request that actually replaces the old image may release it
+        post_query.append(Post.preview_image_path == old_preview_image_path)
+
+    try:
+        result = await Post.find_one(
+            *post_query
+        ).update(
+            Set(post_changes),
+            Inc({
+                Post.version: 1
+            })
+        )
+
+    except BaseException:
+        if preview_image_path:
+            await media_store.release(
+                filename = preview_image_path
+            )
+
+        raise
+
+    if not result.matched_count:
+        # A concurrent edit replaced the image first
+        if preview_image_path:
+            await media_store.release(
+                filename = preview_image_path
+            )
+
+        raise HTTPException(
+            status_code = status.HTTP_409_CONFLICT,
+            detail = errors.ErrorStrings.POST_EDIT_CONFLICT
+        )
+
+    await response_cache.invalidate_tags([
+        get_post_cache_tag(post.id)
+    ])
+
+    event_hub.publish_local(
+        build_post_edited_event(
+            post_id = post.id
+        )
     )
 
-    await post.insert()
+    if preview_image_path:
+        if old_preview_image_path:
+            await media_store.release(
+                filename = old_preview_image_path
+            )
 
-    return await parse_post_read_model(
-        post = post
+        schedule_post_preview_image_processing(
+            post = post
+        )
+
+    return build_model_response(
+        await parse_post_read_model(
+            post = post
+        )
     )
 
 
@@ -256,6 +1036,13 @@ async def new_post_route(
     user: User = depends_current_active_user,
     post_reaction_create: schemas.PostReactionCreate = Depends()
 ) -> schemas.PostReactionRead:
+    if reactions_buffer.is_enabled:
+        return await reactions_buffer.record(
+            user_id = user.id,
+            post_id = post_reaction_create.post_id,
+            reaction = post_reaction_create.reaction
+        )
+
     post: Union[Post, None] = await Post.get(post_reaction_create.post_id)
 
     if not post:
@@ -288,27 +1075,30 @@ async def new_post_route(
                 detail = errors.ErrorStrings.REACTION_NOT_FOUND
             )
 
-        await post_reaction.delete()
+        await reactions.remove_post_reaction(
+            post_reaction = post_reaction
+        )
 
         is_removed = True
 
-    else:
-        is_added = not bool(post_reaction)
-
-        if post_reaction:
-            if post_reaction.reaction != reaction:
-                post_reaction.reaction = reaction
+    elif post_reaction:
+        if post_reaction.reaction != reaction:
+            is_changed = await reactions.change_post_reaction(
+                post_reaction = post_reaction,
+                reaction = reaction
+            )
 
-                await post_reaction.save()
+    else:
+        is_added = await reactions.add_post_reaction(
+            user_id = user.id,
+            post_id = post.id,
+            reaction = reaction
+        )
 
-                is_changed = True
-
-        else:
-            await PostReaction(
-                user_id = user.id,
-                post_id = post.id,
-                reaction = reaction
-            ).insert()
+    if is_added or is_changed or is_removed:
+        await response_cache.invalidate_tags([
+            get_post_cache_tag(post.id)
+        ])
 
     return schemas.PostReactionRead(
         reaction = post_reaction_create.reaction,
@@ -316,3 +1106,84 @@ async def new_post_route(
         is_changed = is_changed,
         is_removed = is_removed
     )
+
+
+@router.post(
+    path = "/reactions/batch",
+    response_model = schemas.PostReactionBatchRead,
+    summary = "Set many reactions",
+    responses = {
+        **errors.ErrorResponses.USER_AUTH,
+        **errors.ErrorResponses.BATCH_TOO_LARGE
+    }
+)
+async def new_post_reactions_batch_route(
+    post_reaction_batch_create: schemas.PostReactionBatchCreate,
+    user: User = depends_current_active_user
+) -> schemas.PostReactionBatchRead:
+    if len(post_reaction_batch_create.reactions) > config.api_reactions_batch_limit:
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST,
+            detail = errors.ErrorStrings.BATCH_TOO_LARGE
+        )
+
+    if len(reactions_buffer):
+        # The batch reads the current reactions from the database
+        await reactions_buffer.flush()
+
+    post_reactions_reads: List[schemas.PostReactionBatchItemRead] = await reactions.apply_post_reactions_batch(
+        user_id = user.id,
+        post_reactions_creates = post_reaction_batch_create.reactions
+    )
+
+    changed_post_ids: List[PydanticObjectId] = list({
+        post_reaction_read.post_id
+        for post_reaction_read in post_reactions_reads
+        if post_reaction_read.is_added or post_reaction_read.is_changed or post_reaction_read.is_removed
+    })
+
+    if changed_post_ids:
+        await response_cache.invalidate_tags([
+            get_post_cache_tag(post_id)
+            for post_id in changed_post_ids
+        ])
+
+    return schemas.PostReactionBatchRead(
+        reactions = post_reactions_reads
+    )
+
+
+@router.get(
+    path = "/reactions/batch",
+    response_model = schemas.PostReactionsStateRead,
+    summary = "Show my reactions for many posts",
+    responses = {
+        **errors.ErrorResponses.USER_AUTH,
+        **errors.ErrorResponses.BATCH_TOO_LARGE
+    }
+)
+async def get_post_reactions_batch_route(
+    post_ids: List[schemas.Id] = Query(),
+    user: User = depends_current_active_user
+) -> schemas.PostReactionsStateRead:
+    if len(post_ids) > config.api_reactions_batch_limit:
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST,
+            detail = errors.ErrorStrings.BATCH_TOO_LARGE
+        )
+
+    user_post_reactions: Dict[PydanticObjectId, str] = reactions_buffer.overlay_user_reactions(
+        user_id = user.id,
+        post_ids = post_ids,
+        reactions = await reactions.get_user_post_reactions(
+            user_id = user.id,
+            post_ids = post_ids
+        )
+    )
+
+    return schemas.PostReactionsStateRead(
+        reactions = {
+            str(post_id): reaction
+            for post_id, reaction in user_post_reactions.items()
+        }
+    )
@@ -5,11 +5,23 @@ from fastapi_users import BaseUserManager, FastAPIUsers
 from fastapi_users_db_beanie import ObjectIDIDMixin
 
 from fastapi_users import models as fu_models, exceptions as fu_exceptions
+from fastapi_users.jwt import decode_jwt
+from jwt import PyJWTError
+from beanie import PydanticObjectId
+from pymongo.errors import DuplicateKeyError
+from time import time
 
+from app import SHUTDOWN_COROS
 from app.db import User, get_user_db
+from app.schemas import UserCreate
+from app.authors import invalidate_author
+from app.response_cache import response_cache, get_author_cache_tag
+from app.passwords import password_hashing_pool
+from app.cache import TTLCache
 from app.config import config
+from app.metrics import register_cache_metrics
 
-from typing import Optional
+from typing import Optional, Dict, Any
 
 
 cookie_transport: CookieTransport = CookieTransport(
@@ -18,14 +30,87 @@ cookie_transport: CookieTransport = CookieTransport(
 )
 
 
-def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
-        secret = config.secret,
-        lifetime_seconds = config.secrets_lifetime,
-        algorithm = "HS256"
+verified_tokens_cache: TTLCache[str, User] = TTLCache(
+    max_size = config.auth_cache.max_size,
+    ttl = config.auth_cache.ttl
+)
+
+register_cache_metrics("verified_tokens", verified_tokens_cache)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """`JWTStrategy` that remembers verified tokens, skipping the decode and user lookup until expiry."""
+
+    async def read_token(
+        self,
+        token: Optional[str],
+        user_manager: BaseUserManager[User, ObjectIDIDMixin]
+    ) -> Optional[User]:
+        if token is None:
+            return None
+
+        cached_user: Optional[User] = verified_tokens_cache.get(token)
+
+        if cached_user is not None:
+            return cached_user.copy()
+
+        try:
+            data: dict = decode_jwt(
+                token,
+                self.decode_key,
+                self.token_audience,
+                algorithms = [
+                    self.algorithm
+                ]
+            )
+
+        except PyJWTError:
+            return None
+
+        user_id: Optional[str] = data.get("sub")
+
+        if user_id is None:
+            return None
+
+        try:
+            user: User = await user_manager.get(user_manager.parse_id(user_id))
+
+        except (fu_exceptions.UserNotExists, fu_exceptions.InvalidID):
+            return None
+
+        ttl: float = verified_tokens_cache.ttl
+
+        if "exp" in data:
+            ttl = min(ttl, data["exp"] - time())
+
+        if ttl > 0:
+            verified_tokens_cache.set(token, user.copy(), ttl=ttl)
+
+        return user
+
+    async def destroy_token(self, token: str, user: User) -> None:
+        verified_tokens_cache.invalidate(token)
+
+        await super().destroy_token(token, user)
+
+
+def invalidate_user_tokens(user_id: PydanticObjectId) -> None:
+    verified_tokens_cache.invalidate_matching(
+        lambda token, user: user.id == user_id
     )
 
 
+jwt_strategy: CachedJWTStrategy = CachedJWTStrategy(
+    secret = config.secret,
+    lifetime_seconds = config.secrets_lifetime,
+    algorithm = "HS256"
+)
+
+
+def get_jwt_strategy() -> JWTStrategy:
+    return jwt_strategy
+
+
 auth_backend: AuthenticationBackend = AuthenticationBackend(
     name = "jwt",
     transport = cookie_transport,
@@ -62,6 +147,99 @@ class UserManager(ObjectIDIDMixin, BaseUserManager[User, ObjectIDIDMixin]):
     ) -> None:
         print(f"Verification requested for user {user.id} ({user.email}). Verification token: {token}")
 
+    async def on_after_verify(
+        self,
+        user: User,
+        request: Optional[Request] = None
+    ) -> None:
+        invalidate_user_tokens(user.id)
+
+    async def on_after_reset_password(
+        self,
+        user: User,
+        request: Optional[Request] = None
+    ) -> None:
+        invalidate_user_tokens(user.id)
+
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: Optional[Request] = None
+    ) -> None:
+        invalidate_user_tokens(user.id)
+
+        if "username" in update_dict:
+            invalidate_author(user.id)
+
+            await response_cache.invalidate_tags([
+                get_author_cache_tag(user.id)
+            ])
+
+    async def on_after_delete(
+        self,
+        user: User,
+        request: Optional[Request] = None
+    ) -> None:
+        invalidate_user_tokens(user.id)
+        invalidate_author(user.id)
+
+        await response_cache.invalidate_tags([
+            get_author_cache_tag(user.id)
+        ])
+
+    async def validate_username(self, username: str, user_id: Optional[PydanticObjectId]=None) -> None:
+        """Refuses usernames that logins, which match case-insensitively, could not tell apart from another account."""
+
+        query: dict = {
+            "$or": [
+                {
+                    "username": username
+                },
+                {
+                    "email": username
+                }
+            ]
+        }
+
+        if user_id is not None:
+            query["_id"] = {
+                "$ne": user_id
+            }
+
+        if await User.get_motor_collection().find_one(
+            query,
+            {
+                "_id": 1
+            },
+            collation = User.Settings.username_collation
+        ) is not None:
+            raise fu_exceptions.UserAlreadyExists()
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None
+    ) -> User:
+        await self.validate_username(user_create.username)
+
+        try:
+            return await super().create(user_create, safe, request)
+
+        except DuplicateKeyError:
+            raise fu_exceptions.UserAlreadyExists()
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        if update_dict.get("username") is not None and update_dict["username"] != user.username:
+            await self.validate_username(update_dict["username"], user.id)
+
+        try:
+            return await super()._update(user, update_dict)
+
+        except DuplicateKeyError:
+            raise fu_exceptions.UserAlreadyExists()
+
     # async def validate_password(
     #     self,
     #     password: str,
@@ -93,10 +271,14 @@ async def user_manager_authenticate(
         user = await self.get_by_email_or_username(credentials.username)
 
     except fu_exceptions.UserNotExists:
-        self.password_helper.hash(credentials.password)
+        await password_hashing_pool.run(
+            self.password_helper.hash,
+            credentials.password
+        )
         return None
 
-    verified, updated_password_hash = self.password_helper.verify_and_update(
+    verified, updated_password_hash = await password_hashing_pool.run(
+        self.password_helper.verify_and_update,
         credentials.password,
         user.hashed_password
     )
@@ -117,6 +299,8 @@ async def user_manager_authenticate(
 UserManager.get_by_email_or_username = user_manager_get_by_email_or_username
 UserManager.authenticate = user_manager_authenticate
 
+SHUTDOWN_COROS.append(password_hashing_pool.shutdown())
+
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(
         user_db = user_db
@@ -0,0 +1,83 @@
+from beanie import PydanticObjectId
+from beanie.operators import In
+
+from app.cache import TTLCache
+from app.db import User, UserUsernameView
+from app.config import config
+from app.metrics import register_cache_metrics
+
+from typing import Dict, Iterable, List, Optional
+
+
+authors_cache: TTLCache[PydanticObjectId, str] = TTLCache(
+    max_size = config.authors_cache.max_size,
+    ttl = config.authors_cache.ttl
+)
+
+authors_ids_cache: TTLCache[str, PydanticObjectId] = TTLCache(
+    max_size = config.authors_cache.max_size,
+    ttl = config.authors_cache.ttl
+)
+
+
+async def get_authors_usernames(author_ids: Iterable[PydanticObjectId]) -> Dict[PydanticObjectId, str]:
+    authors_usernames: Dict[PydanticObjectId, str] = {}
+    missing_author_ids: List[PydanticObjectId] = []
+
+    for author_id in set(author_ids):
+        author_username = authors_cache.get(author_id)
+
+        if author_username is None:
+            missing_author_ids.append(author_id)
+
+        else:
+            authors_usernames[author_id] = author_username
+
+    if missing_author_ids:
+        for author in await User.find(
+            In(User.id, missing_author_ids),
+            projection_model = UserUsernameView
+        ).to_list():
+            authors_cache.set(author.id, author.username)
+            authors_usernames[author.id] = author.username
+
+    return authors_usernames
+
+
+async def get_author_id(username: str) -> Optional[PydanticObjectId]:
+    """Resolves a username the way logins do, through `case_insensitive_username_index`."""
+
+    cache_key: str = username.lower()
+    author_id: Optional[PydanticObjectId] = authors_ids_cache.get(cache_key)
+
+    if author_id is not None:
+        return author_id
+
+    author_data: Optional[dict] = await User.get_motor_collection().find_one(
+        {
+            "username": username
+        },
+        {
+            "_id": 1
+        },
+        collation = User.Settings.username_collation,
+        hint = "case_insensitive_username_index"
+    )
+
+    if author_data is None:
+        return None
+
+    authors_ids_cache.set(cache_key, author_data["_id"])
+
+    return author_data["_id"]
+
+
+def invalidate_author(author_id: PydanticObjectId) -> None:
+    authors_cache.invalidate(author_id)
+    authors_ids_cache.invalidate_matching(
+        lambda _, cached_author_id: cached_author_id == author_id
+    )
+
+
+register_cache_metrics("authors", authors_cache)
+register_cache_metrics("authors_ids", authors_ids_cache)
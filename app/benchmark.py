@@ -0,0 +1,1099 @@
+"""Load benchmark of the API against a scratch MongoDB database.
+
+    python -m app.benchmark --users 100 --posts 10000 --reactions 50000 --requests 2000 --concurrency 32
+
+Seeds `<db name>_benchmark` on `db.uri` (dropped first), drives the ASGI app built by `setup_app()`
+in-process and prints throughput, latency percentiles and MongoDB commands per request as JSON.
+`--serialization` instead times building and serializing a list page, without a database.
+`reaction` and `reaction_buffered` run the same requests with the write-behind reactions buffer
+off and on, whatever the config says. The search scenario reads up to 3 pages of random one or
+two word queries; `--posts 1000000` gives the corpus the text index is meant for.
+The upload scenario stores its images in a temporary directory, removed afterwards.
+The projection scenario reads a feed page as whole `Post` documents and as `PostListView`s
+and reports time, CPU time and the peak traced memory of each.
+The depth scenario compares cursor and `offset` pages 1 to 10,000 of the feed, uncached; page
+10,000 needs `--posts` of at least 10,000 times `api_posts_limit`.
+"""
+
+from argparse import ArgumentParser, Namespace
+from asyncio import Event, gather, run as run_asyncio
+from random import Random
+from time import monotonic, process_time, time
+from tracemalloc import start as start_tracemalloc, stop as stop_tracemalloc, get_traced_memory
+from json import dumps as json_dumps, loads as json_loads
+from urllib.parse import urlencode
+from http.cookies import SimpleCookie
+from struct import pack
+from zlib import compress as zlib_compress, crc32
+from uuid import uuid4
+from platform import python_version
+from pathlib import Path
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from starlette.types import ASGIApp, Message
+
+from app.config import config
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+SCENARIOS: List[str] = [
+    "list",
+    "single",
+    "reaction",
+    "reaction_buffered",
+    "login",
+    "upload",
+    "search",
+    "depth",
+    "projection"
+]
+
+# Scenario mixes: the first scenario is measured alone, then while the others run alongside it
+MIXES: List[List[str]] = [
+    [
+        "list",
+        "upload"
+    ],
+    [
+        "list",
+        "login"
+    ]
+]
+
+# Feed pages compared by the depth scenario
+DEPTH_PAGES: List[int] = [
+    1,
+    100,
+    1000,
+    10000
+]
+
+SEED_BATCH_SIZE: int = 10000
+BENCHMARK_PASSWORD: str = "benchmark-password"
+# Pages of the same search query read one after another before a new query is picked
+SEARCH_PAGES: int = 3
+
+WORDS: List[str] = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore magna aliqua".split()
+
+
+class ASGIResponse:
+    def __init__(self, status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        self.status_code: int = status_code
+        self.headers: List[Tuple[bytes, bytes]] = headers
+        self.body: bytes = body
+
+    def json(self) -> Any:
+        return json_loads(self.body)
+
+
+async def call_asgi(
+    app: ASGIApp,
+    method: str,
+    path: str,
+    params: Optional[Dict[str, Any]]=None,
+    headers: Optional[Dict[str, str]]=None,
+    body: bytes=b""
+) -> ASGIResponse:
+    """Sends one HTTP request straight to `app`, without sockets, so only the app itself is measured."""
+
+    request_headers: Dict[str, str] = {
+        "host": "benchmark",
+        "content-length": str(len(body)),
+        **(headers or {})
+    }
+
+    scope: Dict[str, Any] = {
+        "type": "http",
+        "asgi": {
+            "version": "3.0"
+        },
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "root_path": "",
+        "query_string": urlencode(params or {}).encode("ascii"),
+        "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in request_headers.items()
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80)
+    }
+
+    is_body_sent: bool = False
+    status_code: int = 500
+    response_headers: List[Tuple[bytes, bytes]] = []
+    response_body: List[bytes] = []
+
+    async def receive() -> Message:
+        nonlocal is_body_sent
+
+        if is_body_sent:
+            return {
+                "type": "http.disconnect"
+            }
+
+        is_body_sent = True
+
+        return {
+            "type": "http.request",
+            "body": body,
+            "more_body": False
+        }
+
+    async def send(message: Message) -> None:
+        nonlocal status_code, response_headers
+
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            response_headers = message.get("headers", [])
+
+        elif message["type"] == "http.response.body":
+            response_body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+
+    return ASGIResponse(
+        status_code = status_code,
+        headers = response_headers,
+        body = b"".join(response_body)
+    )
+
+
+def build_png(width: int, height: int, random: Random) -> bytes:
+    """Builds a valid, noisy RGB PNG, so that every upload is a distinct media blob."""
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return pack(">I", len(data)) + chunk_type + data + pack(">I", crc32(chunk_type + data) & 0xFFFFFFFF)
+
+    rows: bytes = b"".join(
+        b"\x00" + random.getrandbits(width * 3 * 8).to_bytes(width * 3, "big")
+        for _ in range(height)
+    )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib_compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def build_multipart(field_name: str, filename: str, content_type: str, data: bytes) -> Tuple[str, bytes]:
+    boundary: str = uuid4().hex
+
+    return (
+        f"multipart/form-data; boundary={boundary}",
+        (
+            f"--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"{field_name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        + data
+        + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    )
+
+
+def get_percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+
+    return {
+        "mean": round(sum(latencies) / max(len(latencies), 1) * 1000, 3),
+        "p50": round(get_percentile(latencies, 50) * 1000, 3),
+        "p95": round(get_percentile(latencies, 95) * 1000, 3),
+        "p99": round(get_percentile(latencies, 99) * 1000, 3),
+        "max": round(latencies[-1] * 1000, 3) if latencies else 0.0
+    }
+
+
+async def seed_database(users_count: int, posts_count: int, reactions_count: int, random: Random) -> Dict[str, Any]:
+    from fastapi_users.password import PasswordHelper
+
+    from app.db import User, Post, PostReaction
+    from app.reactions import reconcile_post_reactions
+
+    started_at: float = monotonic()
+    now: int = int(time())
+
+    # One hash for everyone: seeding should not take as long as the login benchmark
+    hashed_password: str = PasswordHelper().hash(BENCHMARK_PASSWORD)
+
+    user_ids: List[Any] = (await User.get_motor_collection().insert_many([
+        {
+            "username": f"user{index}",
+            "email": f"user{index}@benchmark.local",
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+            "created_at": now
+        }
+        for index in range(users_count)
+    ])).inserted_ids
+
+    post_ids: List[Any] = []
+
+    for batch_start in range(0, posts_count, SEED_BATCH_SIZE):
+        post_ids.extend((await Post.get_motor_collection().insert_many([
+            {
+                "title": " ".join(random.choices(WORDS, k=5)),
+                "content": " ".join(random.choices(WORDS, k=60)),
+                "preview_image_path": None,
+                "preview_image_variants": {},
+                "author_id": random.choice(user_ids),
+                "is_pinned": index < 2,
+                "edited_at": None,
+                "updated_at": None,
+                "version": 0,
+                "reactions": {},
+                "created_at": now - index
+            }
+            for index in range(batch_start, min(batch_start + SEED_BATCH_SIZE, posts_count))
+        ])).inserted_ids)
+
+    # Distinct (user, post) pairs, as required by `post_user_unique_index`
+    pair_indexes: List[int] = random.sample(
+        range(users_count * posts_count),
+        min(reactions_count, users_count * posts_count)
+    )
+
+    for batch_start in range(0, len(pair_indexes), SEED_BATCH_SIZE):
+        await PostReaction.get_motor_collection().insert_many([
+            {
+                "user_id": user_ids[pair_index // posts_count],
+                "post_id": post_ids[pair_index % posts_count],
+                "reaction": random.choice(config.reactions_list),
+                "created_at": now
+            }
+            for pair_index in pair_indexes[batch_start:batch_start + SEED_BATCH_SIZE]
+        ])
+
+    await reconcile_post_reactions()
+
+    return {
+        "users": len(user_ids),
+        "posts": len(post_ids),
+        "reactions": len(pair_indexes),
+        "seconds": round(monotonic() - started_at, 3)
+    }
+
+
+async def login(app: ASGIApp, username: str) -> ASGIResponse:
+    return await call_asgi(
+        app = app,
+        method = "POST",
+        path = "/api/auth/login",
+        headers = {
+            "content-type": "application/x-www-form-urlencoded"
+        },
+        body = urlencode({
+            "username": username,
+            "password": BENCHMARK_PASSWORD
+        }).encode("ascii")
+    )
+
+
+def get_cookie_header(response: ASGIResponse) -> str:
+    cookie: SimpleCookie = SimpleCookie()
+
+    for name, value in response.headers:
+        if name == b"set-cookie":
+            cookie.load(value.decode("latin-1"))
+
+    return "; ".join(
+        f"{morsel.key}={morsel.value}"
+        for morsel in cookie.values()
+    )
+
+
+class ScenarioWorker:
+    """Per-worker state of a scenario: a logged-in user, a feed cursor and so on."""
+
+    def __init__(self, app: ASGIApp, index: int, post_ids: List[str], users_count: int, random: Random, upload_side: int=64) -> None:
+        self.app: ASGIApp = app
+        self.index: int = index
+        self.post_ids: List[str] = post_ids
+        self.username: str = f"user{index % max(users_count, 1)}"
+        self.random: Random = random
+        self.upload_side: int = upload_side
+        self.cookie_header: str = ""
+        self.cursor: Optional[str] = None
+        self.search_query: str = ""
+        self.search_cursor: Optional[str] = None
+        self.search_page: int = 0
+
+    async def setup(self, scenario: str) -> None:
+        if scenario in ("reaction", "upload"):
+            self.cookie_header = get_cookie_header(await login(self.app, self.username))
+
+    async def run(self, scenario: str) -> ASGIResponse:
+        if scenario == "list":
+            response: ASGIResponse = await call_asgi(
+                app = self.app,
+                method = "GET",
+                path = "/api/posts/list",
+                params = (
+                    {
+                        "cursor": self.cursor
+                    }
+                    if self.cursor
+                    else
+                    {}
+                )
+            )
+
+            if response.status_code == 200:
+                self.cursor = response.json()["next_cursor"]
+
+            return response
+
+        if scenario == "search":
+            if self.search_cursor is None or self.search_page >= SEARCH_PAGES:
+                self.search_query = " ".join(self.random.sample(WORDS, k=self.random.randint(1, 2)))
+                self.search_cursor = None
+                self.search_page = 0
+
+            params: Dict[str, Any] = {
+                "q": self.search_query
+            }
+
+            if self.search_cursor:
+                params["cursor"] = self.search_cursor
+
+            response = await call_asgi(
+                app = self.app,
+                method = "GET",
+                path = "/api/posts/search",
+                params = params
+            )
+
+            self.search_cursor = None
+
+            if response.status_code == 200:
+                self.search_cursor = response.json()["next_cursor"]
+                self.search_page += 1
+
+            return response
+
+        if scenario == "single":
+            return await call_asgi(
+                app = self.app,
+                method = "GET",
+                path = "/api/posts/single",
+                params = {
+                    "post_id": self.random.choice(self.post_ids)
+                }
+            )
+
+        if scenario == "reaction":
+            return await call_asgi(
+                app = self.app,
+                method = "POST",
+                path = "/api/posts/reaction",
+                params = {
+                    "post_id": self.random.choice(self.post_ids),
+                    "reaction": self.random.choice(config.reactions_list)
+                },
+                headers = {
+                    "cookie": self.cookie_header
+                }
+            )
+
+        if scenario == "login":
+            return await login(self.app, self.username)
+
+        if scenario == "upload":
+            content_type, body = build_multipart(
+                field_name = "preview_image",
+                filename = "benchmark.png",
+                content_type = "image/png",
+                data = build_png(self.upload_side, self.upload_side, self.random)
+            )
+
+            return await call_asgi(
+                app = self.app,
+                method = "POST",
+                path = "/api/posts/single",
+                params = {
+                    "title": " ".join(self.random.choices(WORDS, k=5)),
+                    "content": " ".join(self.random.choices(WORDS, k=60))
+                },
+                headers = {
+                    "content-type": content_type,
+                    "cookie": self.cookie_header
+                },
+                body = body
+            )
+
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_scenario(
+    app: ASGIApp,
+    scenario: str,
+    requests_count: int,
+    concurrency: int,
+    post_ids: List[str],
+    users_count: int,
+    random: Random,
+    upload_side: int=64,
+    stop_event: Optional[Event]=None
+) -> Dict[str, Any]:
+    """Runs `requests_count` requests of `scenario` over `concurrency` workers, or until `stop_event` is set."""
+
+    from app.metrics import RequestStats, request_stats_var
+
+    latencies: List[float] = []
+    db_commands_counts: List[int] = []
+    response_sizes: List[int] = []
+    statuses: Dict[str, int] = {}
+    remaining: int = requests_count
+
+    workers: List[ScenarioWorker] = [
+        ScenarioWorker(
+            app = app,
+            index = index,
+            post_ids = post_ids,
+            users_count = users_count,
+            random = Random(random.random()),
+            upload_side = upload_side
+        )
+        for index in range(concurrency)
+    ]
+
+    await gather(*(
+        worker.setup(scenario)
+        for worker in workers
+    ))
+
+    async def run_worker(worker: ScenarioWorker) -> None:
+        nonlocal remaining
+
+        while (remaining > 0) if stop_event is None else not stop_event.is_set():
+            remaining -= 1
+
+            # Being set already, the stats are filled by the app's middleware and DB listener but not recorded
+            request_stats: RequestStats = RequestStats()
+            request_stats_var.set(request_stats)
+
+            started_at: float = monotonic()
+            response: ASGIResponse = await worker.run(scenario)
+            latencies.append(monotonic() - started_at)
+
+            db_commands_counts.append(len(request_stats.db_commands))
+            response_sizes.append(len(response.body))
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    started_at: float = monotonic()
+
+    await gather(*(
+        run_worker(worker)
+        for worker in workers
+    ))
+
+    seconds: float = monotonic() - started_at
+
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+        "db_commands_per_request": round(sum(db_commands_counts) / max(len(db_commands_counts), 1), 2),
+        "response_bytes_mean": round(sum(response_sizes) / max(len(response_sizes), 1), 1),
+        "statuses": statuses
+    }
+
+
+async def run_mix(
+    app: ASGIApp,
+    scenarios: List[str],
+    requests_count: int,
+    concurrency: int,
+    post_ids: List[str],
+    users_count: int,
+    random: Random,
+    upload_side: int
+) -> Dict[str, Any]:
+    """Measures the first of `scenarios` alone, then again while the other scenarios run until it is done."""
+
+    measured_scenario: str = scenarios[0]
+
+    scenario_options: Dict[str, Any] = {
+        "app": app,
+        "concurrency": concurrency,
+        "post_ids": post_ids,
+        "users_count": users_count,
+        "upload_side": upload_side
+    }
+
+    baseline: Dict[str, Any] = await run_scenario(
+        scenario = measured_scenario,
+        requests_count = requests_count,
+        random = Random(random.random()),
+        **scenario_options
+    )
+
+    stop_event: Event = Event()
+
+    async def run_measured() -> Dict[str, Any]:
+        try:
+            return await run_scenario(
+                scenario = measured_scenario,
+                requests_count = requests_count,
+                random = Random(random.random()),
+                **scenario_options
+            )
+
+        finally:
+            stop_event.set()
+
+    mixed_results: List[Dict[str, Any]] = await gather(
+        run_measured(),
+        *(
+            run_scenario(
+                scenario = scenario,
+                requests_count = 0,
+                random = Random(random.random()),
+                stop_event = stop_event,
+                **scenario_options
+            )
+            for scenario in scenarios[1:]
+        )
+    )
+
+    return {
+        "baseline": baseline,
+        "mixed": dict(zip(scenarios, mixed_results)),
+        f"{measured_scenario}_p99_ms": {
+            "alone": baseline["latency_ms"]["p99"],
+            "mixed": mixed_results[0]["latency_ms"]["p99"]
+        }
+    }
+
+
+async def run_reaction_scenario(
+    app: ASGIApp,
+    is_buffered: bool,
+    requests_count: int,
+    concurrency: int,
+    post_ids: List[str],
+    users_count: int,
+    random: Random
+) -> Dict[str, Any]:
+    """Runs the `reaction` scenario with the write-behind buffer on or off, whatever the config says.
+
+    The final flush of the buffered run is timed separately, since counters are only exact after it.
+    """
+
+    from app.reactions_buffer import reactions_buffer
+
+    was_enabled: bool = reactions_buffer.is_enabled
+    reactions_buffer.is_enabled = is_buffered
+
+    written_count: int = reactions_buffer.written_count
+    flushed_count: int = reactions_buffer.flushed_count
+
+    try:
+        await reactions_buffer.start()
+
+        result: Dict[str, Any] = await run_scenario(
+            app = app,
+            scenario = "reaction",
+            requests_count = requests_count,
+            concurrency = concurrency,
+            post_ids = post_ids,
+            users_count = users_count,
+            random = random
+        )
+
+        started_at: float = monotonic()
+
+        await reactions_buffer.shutdown()
+
+        result["final_flush_ms"] = round((monotonic() - started_at) * 1000, 3)
+
+    finally:
+        reactions_buffer.is_enabled = was_enabled
+
+        await reactions_buffer.start()
+
+    result["buffer"] = {
+        "enabled": is_buffered,
+        "flushes": reactions_buffer.flushed_count - flushed_count,
+        "written_changes": reactions_buffer.written_count - written_count
+    }
+
+    return result
+
+
+async def run_projection_scenario(limit: int, rounds: int) -> Dict[str, Any]:
+    """Reads the first feed page as whole `Post` documents and as projected `PostListView`s.
+
+    Wall and process time come from untraced rounds; the peak of the Python heap while one page is read
+    and parsed comes from a separate round under `tracemalloc`, which slows everything down.
+    """
+
+    from bson import BSON
+
+    from app.api.posts import build_posts_query, POSTS_LIST_PROJECTION
+    from app.db import Post, PostListView
+
+    modes: List[Tuple[str, Any, Optional[Dict[str, Any]]]] = [
+        ("document", Post, None),
+        ("projection", PostListView, POSTS_LIST_PROJECTION)
+    ]
+
+    async def read_page(model: Any, projection: Optional[Dict[str, Any]]) -> List[dict]:
+        posts_data: List[dict] = await build_posts_query(
+            offset = 0,
+            limit = limit,
+            cursor = None,
+            projection = projection
+        ).to_list(None)
+
+        for post_data in posts_data:
+            model.parse_obj(post_data)
+
+        return posts_data
+
+    results: Dict[str, Any] = {}
+
+    for mode, model, projection in modes:
+        latencies: List[float] = []
+        cpu_times: List[float] = []
+
+        for _ in range(rounds):
+            started_at: float = monotonic()
+            cpu_started_at: float = process_time()
+
+            posts_data: List[dict] = await read_page(model, projection)
+
+            cpu_times.append(process_time() - cpu_started_at)
+            latencies.append(monotonic() - started_at)
+
+        start_tracemalloc()
+
+        try:
+            base_size, _ = get_traced_memory()
+
+            await read_page(model, projection)
+
+            _, peak_size = get_traced_memory()
+
+        finally:
+            stop_tracemalloc()
+
+        results[mode] = {
+            "latency_ms": summarize_latencies(latencies),
+            "cpu_ms_mean": round(sum(cpu_times) / max(len(cpu_times), 1) * 1000, 3),
+            "peak_memory_kib": round((peak_size - base_size) / 1024, 1),
+            "wire_bytes": sum(
+                len(BSON.encode(post_data))
+                for post_data in posts_data
+            )
+        }
+
+    return {
+        "posts_per_page": limit,
+        "rounds": rounds,
+        "modes": results
+    }
+
+
+async def run_depth_scenario(app: ASGIApp, pages: List[int], rounds: int) -> Dict[str, Any]:
+    """Times `/posts/list` at deep pages of the main feed, reached with a keyset cursor and with `offset`.
+
+    Both read the same posts. The cursor of a page is built from the last post of the page before it,
+    outside the timings. Pages past the end of the feed are reported as `null`.
+    """
+
+    from app.api.posts import build_posts_query, encode_posts_cursor
+    from app.db import PostListView
+
+    limit: int = config.api_posts_limit
+    results: Dict[str, Any] = {}
+
+    for page in pages:
+        offset: int = (page - 1) * limit
+        cursor: Optional[str] = None
+
+        if page > 1:
+            previous_posts: List[dict] = await build_posts_query(
+                offset = offset - 1,
+                limit = 1,
+                cursor = None
+            ).to_list(1)
+
+            if not previous_posts:
+                results[str(page)] = None
+                continue
+
+            cursor = encode_posts_cursor(
+                post = PostListView.parse_obj(previous_posts[0])
+            )
+
+        page_results: Dict[str, Any] = {}
+
+        for mode, params in (
+            ("cursor", {"cursor": cursor} if cursor else {}),
+            ("offset", {"offset": offset})
+        ):
+            latencies: List[float] = []
+
+            for _ in range(rounds):
+                started_at: float = monotonic()
+
+                response: ASGIResponse = await call_asgi(
+                    app = app,
+                    method = "GET",
+                    path = "/api/posts/list",
+                    params = params
+                )
+
+                latencies.append(monotonic() - started_at)
+
+                if response.status_code != 200:
+                    raise RuntimeError(f"Depth scenario got {response.status_code} at page {page} ({mode})")
+
+            page_results[mode] = summarize_latencies(latencies)
+
+        results[str(page)] = page_results
+
+    return {
+        "page_size": limit,
+        "rounds": rounds,
+        "latency_ms_by_page": results
+    }
+
+
+async def run_benchmark(args: Namespace) -> Dict[str, Any]:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app import main_app, setup_app, STARTUP_COROS, SHUTDOWN_COROS
+    from app.db import init_db, build_client_options, Post
+    from app.media import media_store
+    from app.response_cache import response_cache, MemoryResponseCacheBackend
+
+    db_name: str = args.db_name or f"{config.db.name}_benchmark"
+
+    if db_name == config.db.name:
+        raise SystemExit("Refusing to benchmark against the main database, pick another --db-name.")
+
+    setup_app()
+
+    if not args.no_seed:
+        # Dropped before the app connects, so that init_db builds the indexes on the empty database
+        client: AsyncIOMotorClient = AsyncIOMotorClient(
+            config.db.uri,
+            **build_client_options(
+                db_config = config.db
+            )
+        )
+
+        try:
+            await client.drop_database(db_name)
+
+        finally:
+            client.close()
+
+    # Swap the app's database for the scratch one before anything connects
+    STARTUP_COROS[0].close()
+    STARTUP_COROS[0] = init_db(
+        db_config = config.db,
+        db_name = db_name
+    )
+
+    media_dirpath: Path = Path(mkdtemp(prefix="pyblog-benchmark-"))
+    media_store.dirpath = media_dirpath
+
+    if args.no_response_cache and isinstance(response_cache, MemoryResponseCacheBackend):
+        response_cache.max_size = 0
+
+    random: Random = Random(args.seed)
+    seed_result: Optional[Dict[str, Any]] = None
+
+    try:
+        for coro in STARTUP_COROS:
+            await coro
+
+        if not args.no_seed:
+            seed_result = await seed_database(
+                users_count = args.users,
+                posts_count = args.posts,
+                reactions_count = args.reactions,
+                random = random
+            )
+
+        post_ids: List[str] = [
+            str(post_data["_id"])
+            async for post_data in Post.get_motor_collection().find({}, {"_id": 1}).limit(args.sample_posts)
+        ]
+
+        results: Dict[str, Any] = {}
+
+        for scenario in args.scenarios:
+            if scenario == "depth":
+                cache_max_size: Optional[int] = None
+
+                # Every round asks for the same page, which would otherwise be answered from the cache
+                if isinstance(response_cache, MemoryResponseCacheBackend):
+                    cache_max_size, response_cache.max_size = response_cache.max_size, 0
+
+                try:
+                    results[scenario] = await run_depth_scenario(
+                        app = main_app,
+                        pages = args.depth_pages,
+                        rounds = args.depth_rounds
+                    )
+
+                finally:
+                    if cache_max_size is not None:
+                        response_cache.max_size = cache_max_size
+
+                continue
+
+            if scenario == "projection":
+                results[scenario] = await run_projection_scenario(
+                    limit = args.projection_limit,
+                    rounds = args.projection_rounds
+                )
+
+                continue
+
+            if scenario in ("reaction", "reaction_buffered"):
+                results[scenario] = await run_reaction_scenario(
+                    app = main_app,
+                    is_buffered = scenario == "reaction_buffered",
+                    requests_count = args.requests,
+                    concurrency = args.concurrency,
+                    post_ids = post_ids,
+                    users_count = args.users,
+                    random = random
+                )
+
+                continue
+
+            results[scenario] = await run_scenario(
+                app = main_app,
+                scenario = scenario,
+                requests_count = args.requests,
+                concurrency = args.concurrency,
+                post_ids = post_ids,
+                users_count = args.users,
+                random = random
+            )
+
+        mixes: Dict[str, Any] = {}
+
+        for mix in args.mixes:
+            mixes["+".join(mix)] = await run_mix(
+                app = main_app,
+                scenarios = mix,
+                requests_count = args.requests,
+                concurrency = args.concurrency,
+                post_ids = post_ids,
+                users_count = args.users,
+                random = random,
+                upload_side = args.upload_side
+            )
+
+    finally:
+        for coro in SHUTDOWN_COROS:
+            await coro
+
+        rmtree(media_dirpath, ignore_errors=True)
+
+    return {
+        "python": python_version(),
+        "db_name": db_name,
+        "response_cache": not args.no_response_cache,
+        "seed": seed_result,
+        "scenarios": results,
+        "mixes": mixes
+    }
+
+
+async def run_serialization_benchmark(posts_count: int, rounds: int, random: Random) -> Dict[str, Any]:
+    """Times building and serializing a list page of `posts_count` posts, without a database.
+
+    `response_model` is what FastAPI did with a returned model: dump, validate again and encode.
+    """
+
+    from bson import ObjectId
+    from fastapi.encoders import jsonable_encoder
+
+    from app import schemas
+    from app.api.posts import parse_post_read_models
+    from app.authors import authors_cache
+    from app.db import PostListView
+    from app.serialization import build_model, dump_model_json, orjson
+
+    author_ids: List[ObjectId] = [
+        ObjectId()
+        for _ in range(50)
+    ]
+
+    # Known authors keep `parse_post_read_models` off the database
+    for index, author_id in enumerate(author_ids):
+        authors_cache.set(author_id, f"user{index}", ttl=3600)
+
+    now: int = int(time())
+
+    posts: List[PostListView] = [
+        PostListView.parse_obj({
+            "_id": ObjectId(),
+            "title": " ".join(random.choices(WORDS, k=5)),
+            "content": " ".join(random.choices(WORDS, k=60)),
+            "preview_image_path": None if index % 2 else f"{index:064x}.png",
+            "author_id": random.choice(author_ids),
+            "created_at": now - index,
+            "version": 0,
+            "reactions": {
+                reaction: random.randrange(1000)
+                for reaction in config.reactions_list
+            }
+        })
+        for index in range(posts_count)
+    ]
+
+    async def build_post_read_list() -> schemas.PostReadList:
+        return build_model(
+            schemas.PostReadList,
+            posts = await parse_post_read_models(
+                posts = posts
+            ),
+            next_cursor = None
+        )
+
+    async def serialize_response_model() -> bytes:
+        return json_dumps(jsonable_encoder(
+            schemas.PostReadList(**(await build_post_read_list()).dict())
+        )).encode("utf-8")
+
+    async def serialize_model() -> bytes:
+        return dump_model_json(await build_post_read_list())
+
+    modes: List[Tuple[str, bool, Any]] = [
+        ("response_model", False, serialize_response_model),
+        ("validated_json", False, serialize_model)
+    ]
+
+    if orjson is not None:
+        modes.append(("fast_orjson", True, serialize_model))
+
+    results: Dict[str, Any] = {}
+    is_fast_json: bool = config.api_fast_json
+
+    try:
+        for mode, is_fast_mode, serialize in modes:
+            config.api_fast_json = is_fast_mode
+            timings: List[float] = []
+
+            for _ in range(rounds):
+                started_at: float = monotonic()
+                body: bytes = await serialize()
+                timings.append(monotonic() - started_at)
+
+            results[mode] = {
+                "ms_per_1k_posts": round(min(timings) / posts_count * 1000 * 1000, 3),
+                "bytes": len(body)
+            }
+
+    finally:
+        config.api_fast_json = is_fast_json
+
+    return {
+        "python": python_version(),
+        "posts": posts_count,
+        "rounds": rounds,
+        "serialization": results
+    }
+
+
+def parse_args(argv: Optional[List[str]]=None) -> Namespace:
+    parser: ArgumentParser = ArgumentParser(
+        prog = "python -m app.benchmark",
+        description = "Benchmarks the API in-process against a scratch MongoDB database."
+    )
+
+    parser.add_argument("--db-name", default=None, help="scratch database, dropped before seeding (default: <db.name>_benchmark)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--reactions", type=int, default=50000)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data of a previous run")
+    parser.add_argument("--sample-posts", type=int, default=10000, help="posts that single and reaction requests pick from")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=SCENARIOS, help=f"comma separated, of: {','.join(SCENARIOS)}")
+    parser.add_argument("--mixes", type=lambda value: [mix.split("+") for mix in value.split(",") if mix], default=MIXES, help="comma separated scenario mixes like list+upload, the first one is measured (empty to skip)")
+    parser.add_argument("--upload-side", type=int, default=64, help="side in pixels of the uploaded noise PNGs")
+    parser.add_argument("--depth-pages", type=lambda value: [int(page) for page in value.split(",")], default=DEPTH_PAGES, help="feed pages of the depth scenario")
+    parser.add_argument("--depth-rounds", type=int, default=20, help="requests per page and mode of the depth scenario")
+    parser.add_argument("--projection-limit", type=int, default=config.api_posts_limit, help="posts per page of the projection scenario")
+    parser.add_argument("--projection-rounds", type=int, default=50, help="pages read per mode of the projection scenario")
+    parser.add_argument("--no-response-cache", action="store_true", help="measure the uncached read paths")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for comparable runs")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--serialization", action="store_true", help="only time list page serialization, without a database")
+    parser.add_argument("--serialization-posts", type=int, default=1000)
+    parser.add_argument("--serialization-rounds", type=int, default=20)
+
+    args: Namespace = parser.parse_args(argv)
+
+    unknown_scenarios: List[str] = [
+        scenario
+        for scenario in args.scenarios
+        if scenario not in SCENARIOS
+    ]
+
+    unknown_scenarios.extend(
+        scenario
+        for mix in args.mixes
+        for scenario in mix
+        if scenario not in SCENARIOS or scenario in ("depth", "projection", "reaction_buffered")
+    )
+
+    if unknown_scenarios:
+        parser.error(f"unknown scenarios: {', '.join(unknown_scenarios)}")
+
+    return args
+
+
+def _main() -> None:
+    args: Namespace = parse_args()
+    report: str = json_dumps(
+        run_asyncio(
+            run_serialization_benchmark(
+                posts_count = args.serialization_posts,
+                rounds = args.serialization_rounds,
+                random = Random(args.seed)
+            )
+            if args.serialization
+            else
+            run_benchmark(args)
+        ),
+        indent = 2
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    _main()
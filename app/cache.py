@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from time import monotonic
+
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+KT = TypeVar("KT", bound=Hashable)
+VT = TypeVar("VT")
+
+
+class TTLCache(Generic[KT, VT]):
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._entries: "OrderedDict[KT, Tuple[float, VT]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: KT, default: Optional[VT]=None) -> Optional[VT]:
+        entry: Optional[Tuple[float, VT]] = self._entries.get(key)
+
+        if entry is None or entry[0] <= monotonic():
+            if entry is not None:
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry[1]
+
+    def set(self, key: KT, value: VT, ttl: Optional[float]=None) -> None:
+        if self.max_size <= 0:
+            return
+
+        self._entries[key] = (
+            monotonic() + (self.ttl if ttl is None else ttl),
+            value
+        )
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: KT) -> None:
+        self._entries.pop(key, None)
+
+    def invalidate_matching(self, predicate: Callable[[KT, VT], bool]) -> None:
+        for key, (_, value) in list(self._entries.items()):
+            if predicate(key, value):
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -4,19 +4,93 @@ from yaml import load as load_yaml, Loader as YAMLLoader
 
 from app.constants import app_dirpath
 
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 
 CONFIG_FILEPATH: Path = app_dirpath / "config.yml"
 
 
+class ServerConfig(BaseModel):
+    debug: bool = False
+    workers: int = 1
+    reuse_port: bool = False
+    loop: str = "auto"
+    http: str = "auto"
+    backlog: int = 2048
+    timeout_keep_alive: int = 5
+    timeout_graceful_shutdown: Optional[int] = None
+    access_log: bool = True
+
+
+ReadPreferenceName = Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"]
+
+
 class DBConfig(BaseModel):
     uri: str
     name: str
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 30000
+    connect_timeout_ms: int = 20000
+    socket_timeout_ms: Optional[int] = None
+    compressors: List[str] = []
+    zlib_compression_level: Optional[int] = None
+    read_preference: ReadPreferenceName = "primary"
+    feed_read_preference: ReadPreferenceName = "primary"
 
 
 class UserLimitsConfig(BaseModel):
     text_length: int
+    preview_image_size: int
+
+
+class CacheConfig(BaseModel):
+    max_size: int
+    ttl: float
+
+
+class ResponseCacheConfig(CacheConfig):
+    backend: str = "memory"
+    url: Optional[str] = None
+
+
+class ImagesConfig(BaseModel):
+    workers: int
+    quality: int
+    variants: Dict[str, int]
+
+
+class MediaConfig(BaseModel):
+    gc_interval: int
+    gc_grace_period: int
+
+
+class EventsConfig(BaseModel):
+    queue_size: int
+    keepalive_interval: float
+    source: str = "local"
+
+
+class ReactionsBufferConfig(BaseModel):
+    enabled: bool = False
+    flush_interval: float
+    max_pending: int
+    known_posts_cache: CacheConfig
+
+
+class MetricsConfig(BaseModel):
+    enabled: bool = True
+    path: str = "/metrics"
+    slow_request_threshold: float
+    latency_buckets: List[float]
+    size_buckets: List[float]
+
+
+class PasswordsConfig(BaseModel):
+    workers: int
+    max_queue: int
 
 
 class Config(BaseModel):
@@ -26,6 +100,7 @@ class Config(BaseModel):
     version: str
     host: str
     port: int
+    server: ServerConfig
     db: DBConfig
     secret: str
     secrets_lifetime: int
@@ -33,6 +108,18 @@ class Config(BaseModel):
     user_limits: UserLimitsConfig
     reactions_list: List[str]
     api_posts_limit: int
+    api_posts_preview_length: Optional[int] = None
+    api_fast_json: bool = False
+    api_reactions_batch_limit: int
+    authors_cache: CacheConfig
+    auth_cache: CacheConfig
+    response_cache: ResponseCacheConfig
+    images: ImagesConfig
+    media: MediaConfig
+    events: EventsConfig
+    passwords: PasswordsConfig
+    reactions_buffer: ReactionsBufferConfig
+    metrics: MetricsConfig
 
 
 with CONFIG_FILEPATH.open("r", encoding="utf-8") as file:
@@ -6,6 +6,7 @@ from typing import List
 
 app_dirpath: Path = Path(__file__).parent
 parent_dirpath: Path = app_dirpath.parent
+static_posts_dirpath: Path = parent_dirpath / "static" / "posts"
 
 templates: Jinja2Templates = Jinja2Templates(
     directory = parent_dirpath / "templates"
@@ -1,16 +1,20 @@
 from fastapi_users.db import BeanieBaseUser, BeanieUserDatabase
 from beanie import Document, init_beanie, PydanticObjectId
 from beanie.operators import Or
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import IndexModel
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT, ReadPreference
 from pymongo.collation import Collation
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import _ServerMode
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 from asyncio import get_event_loop
 
 from app.utils import get_timestamp
+from app.config import DBConfig
+from app.metrics import db_command_listener, db_pool_listener
 
-from typing import Optional
+from typing import Any, Optional, Dict, List, Type
 
 
 class BaseDocument(Document):
@@ -35,27 +39,139 @@ User.Settings.indexes.extend([
 ])
 
 
+class UserUsernameView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    username: str
+
+
 class Post(BaseDocument):
     class Settings:
         name: str = "posts"
+        indexes = [
+            IndexModel(
+                [
+                    ("is_pinned", DESCENDING),
+                    ("created_at", DESCENDING),
+                    ("_id", DESCENDING)
+                ],
+                name = "feed_index"
+            ),
+            IndexModel(
+                [
+                    ("author_id", ASCENDING),
+                    ("created_at", DESCENDING),
+                    ("_id", DESCENDING)
+                ],
+                name = "author_feed_index"
+            ),
+            IndexModel(
+                [
+                    ("created_at", DESCENDING),
+                    ("_id", DESCENDING)
+                ],
+                name = "created_at_index"
+            ),
+            IndexModel(
+                [
+                    ("title", TEXT),
+                    ("content", TEXT)
+                ],
+                name = "search_index",
+                weights = {
+                    "title": 3,
+                    "content": 1
+                }
+            )
+        ]
+
+    title: str
+    content: str
+    preview_image_path: Optional[str] = None
+    preview_image_variants: Dict[str, str] = Field(default_factory=dict)
+    author_id: PydanticObjectId
+    is_pinned: bool = False
+    edited_at: Optional[int] = None
+    updated_at: Optional[int] = None
+    version: int = 0
+    reactions: Dict[str, int] = Field(default_factory=dict)
+
 
+class PostListView(BaseModel):
+    """Fields of `Post` that a list page needs, validated without the `Document` machinery."""
+
+    id: PydanticObjectId = Field(alias="_id")
     title: str
     content: str
+    is_content_truncated: bool = False
     preview_image_path: Optional[str] = None
+    preview_image_variants: Dict[str, str] = Field(default_factory=dict)
     author_id: PydanticObjectId
     is_pinned: bool = False
+    created_at: int
+    edited_at: Optional[int] = None
+    updated_at: Optional[int] = None
+    version: int = 0
+    reactions: Dict[str, int] = Field(default_factory=dict)
+
+
+class PostValidatorsView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    created_at: int
     edited_at: Optional[int] = None
+    updated_at: Optional[int] = None
+    version: int = 0
 
 
 class PostReaction(BaseDocument):
     class Settings:
         name: str = "post_reactions"
+        indexes = [
+            IndexModel(
+                [
+                    ("post_id", ASCENDING),
+                    ("user_id", ASCENDING)
+                ],
+                name = "post_user_unique_index",
+                unique = True
+            ),
+            IndexModel(
+                [
+                    ("post_id", ASCENDING),
+                    ("reaction", ASCENDING)
+                ],
+                name = "post_reaction_index"
+            )
+        ]
 
     user_id: PydanticObjectId
     post_id: PydanticObjectId
     reaction: str
 
 
+class MediaBlob(BaseDocument):
+    class Settings:
+        name: str = "media_blobs"
+        indexes = [
+            IndexModel(
+                "filename",
+                name = "filename_unique_index",
+                unique = True
+            ),
+            IndexModel(
+                [
+                    ("references", ASCENDING),
+                    ("unreferenced_at", ASCENDING)
+                ],
+                name = "unreferenced_index"
+            )
+        ]
+
+    filename: str
+    size: int
+    references: int = 0
+    unreferenced_at: Optional[int] = None
+
+
 async def user_db_get_by_email_or_username(self, username: str) -> Optional[User]:
     return await self.user_model.find_one(
         Or(
@@ -71,15 +187,149 @@ async def get_user_db() -> BeanieUserDatabase:
     yield BeanieUserDatabase(User)
 
 
-async def init_db(db_uri: str, db_name: str) -> None:
-    client: AsyncIOMotorClient = AsyncIOMotorClient(db_uri)
-    client.get_io_loop = get_event_loop
+READ_PREFERENCES: Dict[str, _ServerMode] = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST
+}
 
-    await init_beanie(
-        database = client.get_database(db_name),
-        document_models = [
-            User,
-            Post,
-            PostReaction
-        ]
+feed_read_preference: _ServerMode = ReadPreference.PRIMARY
+feed_motor_collections: Dict[Type[Document], AsyncIOMotorCollection] = {}
+
+
+DOCUMENT_MODELS: List[Type[Document]] = [
+    User,
+    Post,
+    PostReaction,
+    MediaBlob
+]
+
+
+async def get_missing_indexes(database: AsyncIOMotorDatabase, document_models: List[Type[Document]]) -> List[str]:
+    missing_indexes: List[str] = []
+
+    for document_model in document_models:
+        # Read through the database, models after a failed index build are not initialized
+        existing_indexes: dict = await database[document_model.Settings.name].index_information()
+
+        for index in getattr(document_model.Settings, "indexes", []):
+            if not isinstance(index, IndexModel):
+                continue
+
+            index_name: str = index.document["name"]
+
+            if index_name not in existing_indexes:
+                missing_indexes.append(f"{document_model.Settings.name}.{index_name}")
+
+    return missing_indexes
+
+
+def get_feed_motor_collection(document_model: Type[Document]) -> AsyncIOMotorCollection:
+    """Collection of `document_model` for feed reads, which may go to secondaries; writes stay on the primary."""
+
+    feed_motor_collection: Optional[AsyncIOMotorCollection] = feed_motor_collections.get(document_model)
+
+    if feed_motor_collection is None:
+        feed_motor_collection = document_model.get_motor_collection().with_options(
+            read_preference = feed_read_preference
+        )
+
+        feed_motor_collections[document_model] = feed_motor_collection
+
+    return feed_motor_collection
+
+
+def get_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    return {
+        field.alias: 1
+        for field in model.__fields__.values()
+    }
+
+
+def get_post_list_projection(preview_length: Optional[int]) -> Dict[str, Any]:
+    """Projection of `PostListView`, cutting `content` down to `preview_length` characters on the server."""
+
+    projection: Dict[str, Any] = get_projection(PostListView)
+    del projection["is_content_truncated"]
+
+    if preview_length:
+        projection["content"] = {
+            "$substrCP": ["$content", 0, preview_length]
+        }
+        projection["is_content_truncated"] = {
+            "$gt": [
+                {
+                    "$strLenCP": "$content"
+                },
+                preview_length
+            ]
+        }
+
+    return projection
+
+
+def build_client_options(db_config: DBConfig) -> Dict[str, Any]:
+    client_options: Dict[str, Any] = {
+        "maxPoolSize": db_config.max_pool_size,
+        "minPoolSize": db_config.min_pool_size,
+        "maxIdleTimeMS": db_config.max_idle_time_ms,
+        "waitQueueTimeoutMS": db_config.wait_queue_timeout_ms,
+        "serverSelectionTimeoutMS": db_config.server_selection_timeout_ms,
+        "connectTimeoutMS": db_config.connect_timeout_ms,
+        "socketTimeoutMS": db_config.socket_timeout_ms,
+        "read_preference": READ_PREFERENCES[db_config.read_preference]
+    }
+
+    if db_config.compressors:
+        client_options["compressors"] = ",".join(db_config.compressors)
+
+        if db_config.zlib_compression_level is not None:
+            client_options["zlibCompressionLevel"] = db_config.zlib_compression_level
+
+    return client_options
+
+
+async def init_db(db_config: DBConfig, db_name: Optional[str]=None) -> AsyncIOMotorClient:
+    global feed_read_preference
+
+    client: AsyncIOMotorClient = AsyncIOMotorClient(
+        db_config.uri,
+        event_listeners = [
+            db_command_listener,
+            db_pool_listener
+        ],
+        **build_client_options(
+            db_config = db_config
+        )
     )
+    client.get_io_loop = get_event_loop
+
+    feed_read_preference = READ_PREFERENCES[db_config.feed_read_preference]
+    feed_motor_collections.clear()
+
+    database: AsyncIOMotorDatabase = client.get_database(db_name or db_config.name)
+
+    try:
+        await init_beanie(
+            database = database,
+            document_models = DOCUMENT_MODELS
+        )
+
+    except OperationFailure as ex:
+        missing_indexes: List[str] = await get_missing_indexes(
+            database = database,
+            document_models = DOCUMENT_MODELS
+        )
+
+        client.close()
+
+        error_message: str = f"Could not create MongoDB indexes {', '.join(missing_indexes)}: {ex}"
+
+        if "post_reactions.post_user_unique_index" in missing_indexes:
+            error_message += "; run `python -m app.reactions` to remove duplicate post reactions first"
+
+        raise RuntimeError(error_message) from ex
+
+    return client
@@ -31,6 +31,13 @@ class ErrorStrings(str, Enum):
     POST_NOT_FOUND = "POST_NOT_FOUND"
     INVALID_REACTION = "INVALID_REACTION"
     REACTION_NOT_FOUND = "REACTION_NOT_FOUND"
+    INVALID_CURSOR = "INVALID_CURSOR"
+    FILE_TOO_LARGE = "FILE_TOO_LARGE"
+    SERVER_BUSY = "SERVER_BUSY"
+    BATCH_TOO_LARGE = "BATCH_TOO_LARGE"
+    USER_NOT_FOUND = "USER_NOT_FOUND"
+    POST_FORBIDDEN = "POST_FORBIDDEN"
+    POST_EDIT_CONFLICT = "POST_EDIT_CONFLICT"
 
 
 class _Errors(Tuple[int, str], Enum):
@@ -59,6 +66,41 @@ class _Errors(Tuple[int, str], Enum):
         ErrorStrings.REACTION_NOT_FOUND
     )
 
+    INVALID_CURSOR = (
+        status.HTTP_400_BAD_REQUEST,
+        ErrorStrings.INVALID_CURSOR
+    )
+
+    FILE_TOO_LARGE = (
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        ErrorStrings.FILE_TOO_LARGE
+    )
+
+    SERVER_BUSY = (
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        ErrorStrings.SERVER_BUSY
+    )
+
+    BATCH_TOO_LARGE = (
+        status.HTTP_400_BAD_REQUEST,
+        ErrorStrings.BATCH_TOO_LARGE
+    )
+
+    USER_NOT_FOUND = (
+        status.HTTP_404_NOT_FOUND,
+        ErrorStrings.USER_NOT_FOUND
+    )
+
+    POST_FORBIDDEN = (
+        status.HTTP_403_FORBIDDEN,
+        ErrorStrings.POST_FORBIDDEN
+    )
+
+    POST_EDIT_CONFLICT = (
+        status.HTTP_409_CONFLICT,
+        ErrorStrings.POST_EDIT_CONFLICT
+    )
+
 
 class ErrorResponses(dict, Enum):
     USER_AUTH = _build_error_response(_Errors.USER_AUTH)
@@ -66,3 +108,10 @@ class ErrorResponses(dict, Enum):
     POST_NOT_FOUND = _build_error_response(_Errors.POST_NOT_FOUND)
     INVALID_REACTION = _build_error_response(_Errors.INVALID_REACTION)
     REACTION_NOT_FOUND = _build_error_response(_Errors.REACTION_NOT_FOUND)
+    INVALID_CURSOR = _build_error_response(_Errors.INVALID_CURSOR)
+    FILE_TOO_LARGE = _build_error_response(_Errors.FILE_TOO_LARGE)
+    SERVER_BUSY = _build_error_response(_Errors.SERVER_BUSY)
+    BATCH_TOO_LARGE = _build_error_response(_Errors.BATCH_TOO_LARGE)
+    USER_NOT_FOUND = _build_error_response(_Errors.USER_NOT_FOUND)
+    POST_FORBIDDEN = _build_error_response(_Errors.POST_FORBIDDEN)
+    POST_EDIT_CONFLICT = _build_error_response(_Errors.POST_EDIT_CONFLICT)
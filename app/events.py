@@ -0,0 +1,215 @@
+from asyncio import Queue, QueueFull, Task, create_task, sleep, wait_for, TimeoutError as AsyncTimeoutError
+from json import dumps as json_dumps
+
+from app.config import config
+from app.metrics import metrics_registry
+
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set
+
+
+POST_CREATED_EVENT: str = "post_created"
+POST_EDITED_EVENT: str = "post_edited"
+REACTIONS_CHANGED_EVENT: str = "reactions_changed"
+RESET_EVENT: str = "reset"
+
+EDITABLE_POST_FIELDS: Set[str] = {
+    "title",
+    "content",
+    "preview_image_path",
+    "preview_image_variants",
+    "edited_at"
+}
+
+
+class Subscription:
+    def __init__(self, queue_size: int) -> None:
+        self.queue: "Queue[Dict[str, Any]]" = Queue(
+            maxsize = queue_size
+        )
+        self.is_overflowed: bool = False
+
+
+class EventHub:
+    """In-process pub/sub for feed events.
+
+    Every subscriber owns a bounded queue: a subscriber that falls `queue_size` events behind
+    is dropped with a `reset` event instead of slowing down publishers or growing memory.
+    """
+
+    def __init__(self, queue_size: int, keepalive_interval: float, source: str) -> None:
+        self.queue_size: int = queue_size
+        self.keepalive_interval: float = keepalive_interval
+        self.source: str = source
+
+        self._subscriptions: Set[Subscription] = set()
+        self._change_stream_task: Optional[Task] = None
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> Subscription:
+        subscription: Subscription = Subscription(
+            queue_size = self.queue_size
+        )
+
+        self._subscriptions.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions):
+            try:
+                subscription.queue.put_nowait(event)
+
+            except QueueFull:
+                subscription.is_overflowed = True
+                self._subscriptions.discard(subscription)
+
+    def publish_local(self, event: Dict[str, Any]) -> None:
+        """Publishes an event raised by this process, unless events come from the change stream."""
+
+        if self.source == "local":
+            self.publish(event)
+
+    async def stream(self, subscription: Subscription) -> AsyncIterator[str]:
+        try:
+            while True:
+                if subscription.is_overflowed and subscription.queue.empty():
+                    yield format_sse(RESET_EVENT, {})
+                    return
+
+                try:
+                    event: Dict[str, Any] = await wait_for(
+                        subscription.queue.get(),
+                        timeout = self.keepalive_interval
+                    )
+
+                except AsyncTimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield format_sse(event["type"], event)
+
+                if event["type"] == RESET_EVENT:
+                    return
+
+        finally:
+            self.unsubscribe(subscription)
+
+    async def _watch_change_stream(self) -> None:
+        from app.db import Post
+
+        resume_token: Optional[dict] = None
+
+        while True:
+            try:
+                async with Post.get_motor_collection().watch(
+                    [
+                        {
+                            "$match": {
+                                "operationType": {
+                                    "$in": ["insert", "update"]
+                                }
+                            }
+                        }
+                    ],
+                    resume_after = resume_token
+                ) as change_stream:
+                    async for change in change_stream:
+                        resume_token = change_stream.resume_token
+
+                        for event in parse_post_change(change):
+                            self.publish(event)
+
+            except Exception as ex:
+                print(f"Posts change stream failed, reconnecting: {ex!r}")
+
+                await sleep(1)
+
+    async def start(self) -> None:
+        if self.source == "change_stream" and self._change_stream_task is None:
+            self._change_stream_task = create_task(self._watch_change_stream())
+
+    async def shutdown(self) -> None:
+        if self._change_stream_task is not None:
+            self._change_stream_task.cancel()
+            self._change_stream_task = None
+
+        for subscription in list(self._subscriptions):
+            subscription.is_overflowed = True
+
+            try:
+                subscription.queue.put_nowait({
+                    "type": RESET_EVENT
+                })
+
+            except QueueFull:
+                pass
+
+        self._subscriptions.clear()
+
+
+def format_sse(event_type: str, data: Dict[str, Any]) -> str:
+    return f"event: {event_type}\ndata: {json_dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+
+def build_post_created_event(post_id: Any) -> Dict[str, Any]:
+    return {
+        "type": POST_CREATED_EVENT,
+        "post_id": str(post_id)
+    }
+
+
+def build_post_edited_event(post_id: Any) -> Dict[str, Any]:
+    return {
+        "type": POST_EDITED_EVENT,
+        "post_id": str(post_id)
+    }
+
+
+def build_reactions_changed_event(post_id: Any, reactions: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "type": REACTIONS_CHANGED_EVENT,
+        "post_id": str(post_id),
+        "reactions": reactions
+    }
+
+
+def parse_post_change(change: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    post_id: Any = change["documentKey"]["_id"]
+
+    if change["operationType"] == "insert":
+        yield build_post_created_event(post_id)
+        return
+
+    updated_fields: Dict[str, Any] = change.get("updateDescription", {}).get("updatedFields", {})
+
+    reactions: Dict[str, int] = {}
+
+    for field, value in updated_fields.items():
+        if field == "reactions":
+            reactions.update(value)
+
+        elif field.startswith("reactions."):
+            reactions[field[len("reactions."):]] = value
+
+    if reactions:
+        yield build_reactions_changed_event(post_id, reactions)
+
+    if EDITABLE_POST_FIELDS.intersection(updated_fields):
+        yield build_post_edited_event(post_id)
+
+
+event_hub: EventHub = EventHub(
+    queue_size = config.events.queue_size,
+    keepalive_interval = config.events.keepalive_interval,
+    source = config.events.source
+)
+
+metrics_registry.gauge(
+    name = "events_subscribers",
+    documentation = "Open feed event streams."
+).add(lambda: len(event_hub))
@@ -0,0 +1,120 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from asyncio import get_running_loop, create_task, Task
+
+from pathlib import Path
+from os import getpid
+
+from app.config import config
+
+from typing import Dict, Optional, Set
+
+try:
+    from PIL import Image, ImageOps
+
+except ImportError:
+    Image = None
+    ImageOps = None
+
+
+RASTER_IMAGE_EXTENSIONS: Set[str] = {
+    "gif",
+    "jpeg",
+    "jpg",
+    "png",
+    "webp"
+}
+
+
+def render_image_variants(source_filepath: Path, variants: Dict[str, int], quality: int) -> Dict[str, str]:
+    """Runs inside a worker process: writes bounded, metadata-free WebP copies next to the source.
+
+    Variants are named after the source file, so content-addressed sources reuse existing variants.
+    """
+
+    variants_filenames: Dict[str, str] = {}
+
+    with Image.open(source_filepath) as source_image:
+        source_image = ImageOps.exif_transpose(source_image)
+
+        if source_image.mode not in ("RGB", "RGBA"):
+            source_image = source_image.convert("RGBA")
+
+        for variant, max_side in variants.items():
+            variant_filename: str = f"{source_filepath.stem}.{variant}.webp"
+            variants_filenames[variant] = variant_filename
+
+            if source_filepath.with_name(variant_filename).is_file():
+                continue
+
+            variant_image = source_image.copy()
+            variant_image.thumbnail((max_side, max_side))
+
+            temp_filepath: Path = source_filepath.with_name(f".{variant_filename}.{getpid()}.tmp")
+
+            variant_image.save(temp_filepath, format="WEBP", quality=quality, method=4)
+            temp_filepath.replace(source_filepath.with_name(variant_filename))
+
+    return variants_filenames
+
+
+class ImagePipeline:
+    def __init__(self, workers: int, variants: Dict[str, int], quality: int) -> None:
+        self.workers: int = workers
+        self.variants: Dict[str, int] = variants
+        self.quality: int = quality
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[Task] = set()
+
+    @property
+    def is_enabled(self) -> bool:
+        return Image is not None and self.workers > 0 and bool(self.variants)
+
+    def can_process(self, filepath: Path) -> bool:
+        return self.is_enabled and filepath.suffix[1:].lower() in RASTER_IMAGE_EXTENSIONS
+
+    async def start(self) -> None:
+        if self.is_enabled and self._executor is None:
+            # Forked workers would inherit the event loop, the DB client's sockets and locks held by other threads
+            self._executor = ProcessPoolExecutor(
+                max_workers = self.workers,
+                mp_context = get_context("spawn")
+            )
+
+    async def render(self, source_filepath: Path) -> Dict[str, str]:
+        if self._executor is None:
+            raise RuntimeError("The image pipeline is not started")
+
+        return await get_running_loop().run_in_executor(
+            self._executor,
+            render_image_variants,
+            source_filepath,
+            self.variants,
+            self.quality
+        )
+
+    def schedule(self, coro) -> None:
+        task: Task = create_task(coro)
+
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+        if self._executor is not None:
+            self._executor.shutdown(
+                wait = False,
+                cancel_futures = True
+            )
+
+            self._executor = None
+
+
+image_pipeline: ImagePipeline = ImagePipeline(
+    workers = config.images.workers,
+    variants = config.images.variants,
+    quality = config.images.quality
+)
@@ -0,0 +1,258 @@
+"""HTTP load driver for a running server, to see how throughput scales with worker processes.
+
+    python -m app --workers 4 &
+    python -m app.load --url http://127.0.0.1:80/api/posts/list --connections 64 --duration 10
+
+Every connection is a keep-alive HTTP/1.1 connection that sends its next request as soon as the
+previous response is read. `--spawn-workers 1,2,4` instead starts `python -m app --workers N`
+for every N in turn on `--url`'s port, loads it and stops it, and reports all runs together.
+Run it from another machine, or pinned to other cores, so that the driver does not compete with
+the workers it measures.
+"""
+
+from argparse import ArgumentParser, Namespace
+from asyncio import StreamReader, StreamWriter, gather, open_connection, run as run_asyncio, sleep
+from subprocess import Popen
+from signal import SIGTERM
+from sys import executable
+from time import monotonic
+from json import dumps as json_dumps
+from urllib.parse import urlsplit, SplitResult
+from os import cpu_count
+from platform import python_version
+
+from app.benchmark import summarize_latencies
+
+from typing import Any, Dict, List, Optional
+
+
+# How long a spawned server gets to start answering
+SPAWN_TIMEOUT: float = 60.0
+
+
+class LoadTarget:
+    def __init__(self, url: str) -> None:
+        split_url: SplitResult = urlsplit(url)
+
+        if split_url.scheme != "http":
+            raise SystemExit(f"Only http:// URLs are supported, got {url!r}.")
+
+        self.host: str = split_url.hostname or "127.0.0.1"
+        self.port: int = split_url.port or 80
+        self.path: str = (split_url.path or "/") + (f"?{split_url.query}" if split_url.query else "")
+
+        self.request: bytes = (
+            f"GET {self.path} HTTP/1.1\r\n"
+            f"Host: {split_url.netloc}\r\n"
+            "Connection: keep-alive\r\n"
+            "\r\n"
+        ).encode("latin-1")
+
+
+async def read_response(reader: StreamReader) -> int:
+    """Reads one response and returns its status; the body is read as announced, fixed or chunked."""
+
+    head: bytes = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+
+    headers: Dict[str, str] = {}
+
+    for header_line in header_lines:
+        if header_line:
+            name, _, value = header_line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            chunk_size: int = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(chunk_size + 2)
+
+            if not chunk_size:
+                break
+
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+
+    return int(status_line.split(" ")[1])
+
+
+async def run_connection(target: LoadTarget, deadline: float, latencies: List[float], statuses: Dict[int, int]) -> int:
+    """Sends requests over one connection until `deadline`, reconnecting after errors. Returns the errors count."""
+
+    errors_count: int = 0
+    writer: Optional[StreamWriter] = None
+
+    while monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await open_connection(target.host, target.port)
+
+            started_at: float = monotonic()
+
+            writer.write(target.request)
+            status_code: int = await read_response(reader)
+
+            latencies.append(monotonic() - started_at)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+        except (OSError, EOFError, ValueError) as ex:
+            errors_count += 1
+
+            if writer is not None:
+                writer.close()
+                writer = None
+
+            # Refused connections would otherwise spin
+            if isinstance(ex, ConnectionRefusedError):
+                await sleep(0.1)
+
+    if writer is not None:
+        writer.close()
+
+    return errors_count
+
+
+async def run_load(target: LoadTarget, connections: int, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    started_at: float = monotonic()
+
+    errors_counts: List[int] = await gather(*(
+        run_connection(
+            target = target,
+            deadline = started_at + duration,
+            latencies = latencies,
+            statuses = statuses
+        )
+        for _ in range(connections)
+    ))
+
+    elapsed: float = monotonic() - started_at
+
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "errors": sum(errors_counts),
+        "statuses": {
+            str(status_code): count
+            for status_code, count in sorted(statuses.items())
+        },
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": summarize_latencies(latencies)
+    }
+
+
+async def wait_until_serving(target: LoadTarget, process: Popen) -> None:
+    deadline: float = monotonic() + SPAWN_TIMEOUT
+
+    while monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"The server exited with code {process.returncode} before serving.")
+
+        try:
+            reader, writer = await open_connection(target.host, target.port)
+
+        except OSError:
+            await sleep(0.2)
+            continue
+
+        try:
+            writer.write(target.request)
+            await read_response(reader)
+            return
+
+        except (OSError, EOFError, ValueError):
+            await sleep(0.2)
+
+        finally:
+            writer.close()
+
+    raise SystemExit(f"The server did not answer on {target.host}:{target.port} within {SPAWN_TIMEOUT:.0f} seconds.")
+
+
+async def run_spawned_load(target: LoadTarget, workers_counts: List[int], connections: int, duration: float, warmup: float) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+
+    for workers_count in workers_counts:
+        process: Popen = Popen([
+            executable, "-m", "app",
+            "--workers", str(workers_count),
+            "--port", str(target.port)
+        ])
+
+        try:
+            await wait_until_serving(target, process)
+
+            # Lets every worker connect to the database and fill its caches
+            await run_load(target, connections, warmup)
+
+            results[str(workers_count)] = await run_load(target, connections, duration)
+
+        finally:
+            # Workers drain their in-flight requests on SIGTERM
+            process.send_signal(SIGTERM)
+            process.wait()
+
+    return results
+
+
+def parse_args(argv: Optional[List[str]]=None) -> Namespace:
+    parser: ArgumentParser = ArgumentParser(
+        prog = "python -m app.load",
+        description = "Loads a running server over keep-alive HTTP/1.1 connections."
+    )
+
+    parser.add_argument("--url", default="http://127.0.0.1:80/api/posts/list", help="requested on every connection")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unreported load before every spawned run")
+    parser.add_argument("--spawn-workers", type=lambda value: [int(workers_count) for workers_count in value.split(",")], default=None, help="comma separated worker counts to start and load one after another")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+
+    return parser.parse_args(argv)
+
+
+def _main() -> None:
+    args: Namespace = parse_args()
+    target: LoadTarget = LoadTarget(args.url)
+
+    report: Dict[str, Any] = {
+        "python": python_version(),
+        "cpu_count": cpu_count(),
+        "url": args.url,
+        "duration": args.duration
+    }
+
+    if args.spawn_workers:
+        report["workers"] = run_asyncio(
+            run_spawned_load(
+                target = target,
+                workers_counts = args.spawn_workers,
+                connections = args.connections,
+                duration = args.duration,
+                warmup = args.warmup
+            )
+        )
+
+    else:
+        report["load"] = run_asyncio(
+            run_load(
+                target = target,
+                connections = args.connections,
+                duration = args.duration
+            )
+        )
+
+    report_json: str = json_dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report_json + "\n")
+
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,12 +1,54 @@
 from fastapi import APIRouter, Request, FastAPI
 from fastapi.responses import HTMLResponse
+from markupsafe import Markup
 
 from app import constants
+from app.api import posts
+from app.config import config
+from app.response_cache import CachedResponse, response_cache, build_cache_key
+
+from typing import Union
 
 
 router: APIRouter = APIRouter()
 
 
+async def render_posts_fragment() -> str:
+    cache_key: str = build_cache_key(
+        route = "index:posts"
+    )
+
+    cached_fragment: Union[CachedResponse, None] = await response_cache.get(cache_key)
+
+    if cached_fragment is None:
+        cache_generation: int = await response_cache.get_generation()
+
+        post_read_list, _ = await posts.get_post_read_list(
+            offset = 0,
+            limit = config.api_posts_limit,
+            cursor = None
+        )
+
+        cached_fragment = CachedResponse(
+            content = constants.templates.get_template("posts.html").render(
+                posts = post_read_list.posts,
+                next_cursor = post_read_list.next_cursor
+            ).encode("utf-8"),
+            headers = {}
+        )
+
+        await response_cache.set(
+            key = cache_key,
+            value = cached_fragment,
+            tags = posts.get_post_read_list_cache_tags(
+                post_read_list = post_read_list
+            ),
+            generation = cache_generation
+        )
+
+    return cached_fragment.content.decode("utf-8")
+
+
 @router.api_route(
     path = "/",
     response_class = HTMLResponse
@@ -15,7 +57,8 @@ async def main_app_index_route(request: Request) -> HTMLResponse:
     return constants.templates.TemplateResponse(
         name = "index.html",
         context = {
-            "request": request
+            "request": request,
+            "posts_html": Markup(await render_posts_fragment())
         }
     )
 
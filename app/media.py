@@ -0,0 +1,194 @@
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from pymongo import ReturnDocument
+from asyncio import sleep, create_task, Task, CancelledError
+
+from pathlib import Path
+from uuid import uuid4
+
+from app.db import MediaBlob
+from app.uploads import stream_upload_file
+from app.utils import get_timestamp
+from app.config import config
+from app import constants
+
+from typing import List, Optional, Tuple
+
+
+class MediaStore:
+    """Content-addressed, reference-counted file storage: identical uploads share one file on disk."""
+
+    def __init__(self, dirpath: Path, derived_suffixes: List[str], gc_interval: int, gc_grace_period: int) -> None:
+        self.dirpath: Path = dirpath
+        self.derived_suffixes: List[str] = derived_suffixes
+        self.gc_interval: int = gc_interval
+        self.gc_grace_period: int = gc_grace_period
+
+        self._gc_task: Optional[Task] = None
+
+    async def store(self, upload_file: UploadFile, extension: str, max_size: int) -> str:
+        temp_filepath: Path = self.dirpath / f".{uuid4().hex}.tmp"
+
+        size, file_hash = await stream_upload_file(
+            upload_file = upload_file,
+            filepath = temp_filepath,
+            max_size = max_size
+        )
+
+        filename: str = f"{file_hash}.{extension}"
+
+        try:
+            media_blob_data: dict = await MediaBlob.get_motor_collection().find_one_and_update(
+                {
+                    "filename": filename
+                },
+                {
+                    "$inc": {
+                        "references": 1
+                    },
+                    "$set": {
+                        "unreferenced_at": None
+                    },
+                    "$setOnInsert": {
+                        "filename": filename,
+                        "size": size,
+                        "created_at": get_timestamp()
+                    }
+                },
+                upsert = True,
+                return_document = ReturnDocument.AFTER
+            )
+
+            if media_blob_data["references"] == 1 or not await run_in_threadpool((self.dirpath / filename).is_file):
+                await run_in_threadpool(temp_filepath.replace, self.dirpath / filename)
+
+        finally:
+            await run_in_threadpool(temp_filepath.unlink, True)
+
+        return filename
+
+    async def release(self, filename: str) -> None:
+        await MediaBlob.get_motor_collection().update_one(
+            {
+                "filename": filename,
+                "references": {
+                    "$gt": 0
+                }
+            },
+            [
+                {
+                    "$set": {
+                        "references": {
+                            "$subtract": ["$references", 1]
+                        },
+                        "unreferenced_at": {
+                            "$cond": [
+                                {
+                                    "$lte": ["$references", 1]
+                                },
+                                get_timestamp(),
+                                None
+                            ]
+                        }
+                    }
+                }
+            ]
+        )
+
+    def get_filepaths(self, filename: str) -> List[Path]:
+        stem: str = filename.rsplit(".", 1)[0]
+
+        return [
+            self.dirpath / filename,
+            *(
+                self.dirpath / f"{stem}{derived_suffix}"
+                for derived_suffix in self.derived_suffixes
+            )
+        ]
+
+    async def collect_garbage(self) -> int:
+        collected_count: int = 0
+        media_blobs_collection = MediaBlob.get_motor_collection()
+
+        while True:
+            media_blob_data: Optional[dict] = await media_blobs_collection.find_one_and_delete({
+                "references": 0,
+                "unreferenced_at": {
+                    "$lte": get_timestamp() - self.gc_grace_period
+                }
+            })
+
+            if media_blob_data is None:
+                return collected_count
+
+            filename: str = media_blob_data["filename"]
+            trash_filepaths: List[Tuple[Path, Path]] = []
+
+            for filepath in self.get_filepaths(filename):
+                trash_filepath: Path = filepath.with_name(f".{filepath.name}.{uuid4().hex}.trash")
+
+                try:
+                    await run_in_threadpool(filepath.replace, trash_filepath)
+
+                except FileNotFoundError:
+                    continue
+
+                trash_filepaths.append((filepath, trash_filepath))
+
+            # The blob may have been uploaded again between the delete and the renames
+            is_restored: bool = bool(
+                await media_blobs_collection.count_documents(
+                    {
+                        "filename": filename
+                    },
+                    limit = 1
+                )
+            )
+
+            for filepath, trash_filepath in trash_filepaths:
+                if is_restored:
+                    await run_in_threadpool(trash_filepath.replace, filepath)
+
+                else:
+                    await run_in_threadpool(trash_filepath.unlink, True)
+
+            if is_restored:
+                continue
+
+            collected_count += 1
+
+    async def _run_gc(self) -> None:
+        while True:
+            try:
+                collected_count: int = await self.collect_garbage()
+
+                if collected_count:
+                    print(f"Collected {collected_count} unreferenced media blobs.")
+
+            except CancelledError:
+                raise
+
+            except Exception as ex:
+                print(f"Media garbage collection failed: {ex!r}")
+
+            await sleep(self.gc_interval)
+
+    async def start(self) -> None:
+        if self._gc_task is None and self.gc_interval > 0:
+            self._gc_task = create_task(self._run_gc())
+
+    async def shutdown(self) -> None:
+        if self._gc_task is not None:
+            self._gc_task.cancel()
+            self._gc_task = None
+
+
+media_store: MediaStore = MediaStore(
+    dirpath = constants.static_posts_dirpath,
+    derived_suffixes = [
+        f".{variant}.webp"
+        for variant in config.images.variants
+    ],
+    gc_interval = config.media.gc_interval,
+    gc_grace_period = config.media.gc_grace_period
+)
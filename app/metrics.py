@@ -0,0 +1,445 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from pymongo import monitoring
+from contextvars import ContextVar
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from app.config import config
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED_ROUTE: str = "<unmatched>"
+
+
+def format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...]) -> str:
+    if not label_names:
+        return ""
+
+    return "{" + ",".join(
+        "{}=\"{}\"".format(
+            name,
+            str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        )
+        for name, value in zip(label_names, label_values)
+    ) + "}"
+
+
+class Counter:
+    """Value kept by the registry itself; with `metric_type="gauge"` it may also go down."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]=(), metric_type: str="counter") -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: Tuple[str, ...] = label_names
+        self.metric_type: str = metric_type
+
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock: Lock = Lock()
+
+    def inc(self, *label_values: str, amount: float=1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+            *(
+                f"{self.name}{format_labels(self.label_names, label_values)} {value}"
+                for label_values, value in sorted(self._values.items())
+            )
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: List[float], label_names: Tuple[str, ...]=()) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.buckets: List[float] = sorted(buckets)
+        self.label_names: Tuple[str, ...] = label_names
+
+        # Per label values: count of every bucket (the last one is +Inf) and the sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock: Lock = Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total = self._values.setdefault(
+                label_values,
+                ([0] * (len(self.buckets) + 1), [0.0])
+            )
+
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines: List[str] = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram"
+        ]
+
+        bucket_label_names: Tuple[str, ...] = (*self.label_names, "le")
+
+        for label_values, (counts, total) in sorted(self._values.items()):
+            cumulative_count: int = 0
+
+            for le, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative_count += count
+
+                lines.append(
+                    f"{self.name}_bucket{format_labels(bucket_label_names, (*label_values, le))} {cumulative_count}"
+                )
+
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, label_values)} {total[0]}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, label_values)} {cumulative_count}")
+
+        return lines
+
+
+class Gauge:
+    """Value read from its owner at scrape time, so hot paths do not have to report it.
+
+    Owners that already count something themselves, like cache hits, expose it with `metric_type="counter"`.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]=(), metric_type: str="gauge") -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: Tuple[str, ...] = label_names
+        self.metric_type: str = metric_type
+
+        self._getters: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def add(self, getter: Callable[[], float], *label_values: str) -> None:
+        self._getters[label_values] = getter
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+            *(
+                f"{self.name}{format_labels(self.label_names, label_values)} {getter()}"
+                for label_values, getter in sorted(self._getters.items())
+            )
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...]=(), metric_type: str="counter") -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, label_names, metric_type))
+
+    def histogram(self, name: str, documentation: str, buckets: List[float], label_names: Tuple[str, ...]=()) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, buckets, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...]=(), metric_type: str="gauge") -> Gauge:
+        return self._metrics.setdefault(name, Gauge(name, documentation, label_names, metric_type))
+
+    def render(self) -> str:
+        return "\n".join(
+            line
+            for _, metric in sorted(self._metrics.items())
+            for line in metric.render()
+        ) + "\n"
+
+
+metrics_registry: MetricsRegistry = MetricsRegistry()
+
+
+http_request_duration: Histogram = metrics_registry.histogram(
+    name = "http_request_duration_seconds",
+    documentation = "HTTP request latency by route.",
+    buckets = config.metrics.latency_buckets,
+    label_names = ("method", "route", "status")
+)
+
+http_response_size: Histogram = metrics_registry.histogram(
+    name = "http_response_size_bytes",
+    documentation = "HTTP response body size by route.",
+    buckets = config.metrics.size_buckets,
+    label_names = ("method", "route")
+)
+
+http_request_db_commands: Histogram = metrics_registry.histogram(
+    name = "http_request_db_commands",
+    documentation = "MongoDB commands issued per HTTP request by route.",
+    buckets = [0, 1, 2, 3, 5, 10, 20, 50, 100],
+    label_names = ("method", "route")
+)
+
+db_command_duration: Histogram = metrics_registry.histogram(
+    name = "mongodb_command_duration_seconds",
+    documentation = "MongoDB command latency by command name.",
+    buckets = config.metrics.latency_buckets,
+    label_names = ("command", "outcome")
+)
+
+
+cache_hits: Gauge = metrics_registry.gauge(
+    name = "cache_hits_total",
+    documentation = "In-process cache hits.",
+    label_names = ("cache",),
+    metric_type = "counter"
+)
+
+cache_misses: Gauge = metrics_registry.gauge(
+    name = "cache_misses_total",
+    documentation = "In-process cache misses.",
+    label_names = ("cache",),
+    metric_type = "counter"
+)
+
+cache_size: Gauge = metrics_registry.gauge(
+    name = "cache_entries",
+    documentation = "Entries held by in-process caches.",
+    label_names = ("cache",)
+)
+
+
+def register_cache_metrics(cache_name: str, cache: object) -> None:
+    cache_hits.add(lambda: cache.hits, cache_name)
+    cache_misses.add(lambda: cache.misses, cache_name)
+    cache_size.add(lambda: len(cache), cache_name)
+
+
+class RequestStats:
+    def __init__(self) -> None:
+        self.route: str = UNMATCHED_ROUTE
+        # (command name, seconds) of every MongoDB command issued while serving the request
+        self.db_commands: List[Tuple[str, float]] = []
+
+
+# Motor copies the context into its executor threads, so the listener below sees the request's stats
+request_stats_var: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class DBCommandListener(monitoring.CommandListener):
+    def _record(self, event, outcome: str) -> None:
+        seconds: float = event.duration_micros / 1_000_000
+
+        db_command_duration.observe(seconds, event.command_name, outcome)
+
+        request_stats: Optional[RequestStats] = request_stats_var.get()
+
+        if request_stats is not None:
+            request_stats.db_commands.append((event.command_name, seconds))
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event, "failure")
+
+
+db_command_listener: DBCommandListener = DBCommandListener()
+
+
+db_pool_connections: Counter = metrics_registry.counter(
+    name = "mongodb_pool_connections",
+    documentation = "Open MongoDB connections by server and state.",
+    label_names = ("address", "state"),
+    metric_type = "gauge"
+)
+
+db_pool_events: Counter = metrics_registry.counter(
+    name = "mongodb_pool_events_total",
+    documentation = "MongoDB connection pool events by server.",
+    label_names = ("address", "event")
+)
+
+
+def format_address(address: Tuple[str, int]) -> str:
+    return f"{address[0]}:{address[1]}"
+
+
+class DBPoolListener(monitoring.ConnectionPoolListener):
+    """Tracks open and checked out connections of every server's pool, and pool events."""
+
+    def _count(self, event, name: str) -> None:
+        db_pool_events.inc(format_address(event.address), name)
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        self._count(event, "pool_created")
+
+    def pool_ready(self, event) -> None:
+        self._count(event, "pool_ready")
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        self._count(event, "pool_cleared")
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        self._count(event, "pool_closed")
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        db_pool_connections.inc(format_address(event.address), "open")
+        self._count(event, "connection_created")
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        db_pool_connections.inc(format_address(event.address), "open", amount=-1)
+        self._count(event, "connection_closed")
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        pass
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self._count(event, f"check_out_failed_{event.reason}")
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        db_pool_connections.inc(format_address(event.address), "checked_out")
+        self._count(event, "checked_out")
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        db_pool_connections.inc(format_address(event.address), "checked_out", amount=-1)
+
+
+db_pool_listener: DBPoolListener = DBPoolListener()
+
+metrics_registry.gauge(
+    name = "mongodb_pool_max_size",
+    documentation = "Configured maximum of MongoDB connections per server."
+).add(lambda: config.db.max_pool_size)
+
+
+def get_route_template(routes: List[BaseRoute], scope: Scope) -> Optional[str]:
+    for route in routes:
+        match, _ = route.matches(scope)
+
+        if match == Match.FULL:
+            return scope.get("root_path", "") + route.path
+
+    return None
+
+
+class MetricsMiddleware:
+    """Times requests and counts their MongoDB commands.
+
+    Nested apps share one `RequestStats`: the innermost app that knows the route names it, and
+    the outermost one records it, so a request to a mounted app is observed exactly once.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute], slow_request_threshold: float) -> None:
+        self.app: ASGIApp = app
+        # The live routes list of the wrapped app, so routes added after this point are known too
+        self.routes: List[BaseRoute] = routes
+        self.slow_request_threshold: float = slow_request_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_stats: Optional[RequestStats] = request_stats_var.get()
+        is_outermost: bool = request_stats is None
+
+        if is_outermost:
+            request_stats = RequestStats()
+            request_stats_var.set(request_stats)
+
+        route: Optional[str] = get_route_template(self.routes, scope)
+
+        # A mount only names the request until the mounted app finds its own route
+        if route is not None:
+            request_stats.route = route
+
+        if not is_outermost:
+            await self.app(scope, receive, send)
+            return
+
+        status_code: int = 500
+        response_size: int = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_size
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+
+            await send(message)
+
+        started_at: float = monotonic()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+
+        finally:
+            request_stats_var.set(None)
+
+            self.observe(
+                method = scope["method"],
+                request_stats = request_stats,
+                status_code = status_code,
+                response_size = response_size,
+                seconds = monotonic() - started_at,
+                path = scope["path"]
+            )
+
+    def observe(
+        self,
+        method: str,
+        request_stats: RequestStats,
+        status_code: int,
+        response_size: int,
+        seconds: float,
+        path: str
+    ) -> None:
+        http_request_duration.observe(seconds, method, request_stats.route, str(status_code))
+        http_response_size.observe(response_size, method, request_stats.route)
+        http_request_db_commands.observe(len(request_stats.db_commands), method, request_stats.route)
+
+        if seconds < self.slow_request_threshold:
+            return
+
+        db_commands_breakdown: Dict[str, Tuple[int, float]] = {}
+
+        for command_name, command_seconds in request_stats.db_commands:
+            count, total = db_commands_breakdown.get(command_name, (0, 0.0))
+            db_commands_breakdown[command_name] = (count + 1, total + command_seconds)
+
+        print(
+            f"Slow request {method} {path} ({request_stats.route}) -> {status_code}: {seconds * 1000:.1f} ms, "
+            f"{len(request_stats.db_commands)} db commands"
+            + "".join(
+                f", {command_name} x{count} {total * 1000:.1f} ms"
+                for command_name, (count, total) in sorted(db_commands_breakdown.items())
+            )
+        )
+
+
+def install_metrics(app: FastAPI) -> None:
+    app.add_middleware(
+        MetricsMiddleware,
+        routes = app.router.routes,
+        slow_request_threshold = config.metrics.slow_request_threshold
+    )
+
+
+async def metrics_route(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(
+        content = metrics_registry.render(),
+        media_type = PROMETHEUS_CONTENT_TYPE
+    )
+
+
+def mount(app: FastAPI) -> None:
+    app.add_api_route(
+        path = config.metrics.path,
+        endpoint = metrics_route,
+        include_in_schema = False
+    )
@@ -0,0 +1,105 @@
+from fastapi import HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from asyncio import Semaphore, get_running_loop
+from time import monotonic
+
+from app import errors
+from app.config import config
+from app.metrics import metrics_registry
+
+from typing import Any, Callable, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class PasswordHashingPool:
+    """Runs CPU-heavy password hashing on a few dedicated threads instead of the event loop.
+
+    At most `workers` hashes run at once and at most `max_queue` more may wait for a thread;
+    anything beyond that is rejected with 503 so that a login storm cannot pile up unbounded work.
+    """
+
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self.workers: int = workers
+        self.max_queue: int = max_queue
+
+        self.waiting: int = 0
+        self.running: int = 0
+        self.completed: int = 0
+        self.rejected: int = 0
+        self.wait_seconds: float = 0.0
+        self.run_seconds: float = 0.0
+
+        self._semaphore: Semaphore = Semaphore(workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.waiting >= self.max_queue and self._semaphore.locked():
+            self.rejected += 1
+
+            raise HTTPException(
+                status_code = status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail = errors.ErrorStrings.SERVER_BUSY,
+                headers = {
+                    "Retry-After": "1"
+                }
+            )
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers = self.workers,
+                thread_name_prefix = "password-hashing"
+            )
+
+        queued_at: float = monotonic()
+        self.waiting += 1
+
+        try:
+            await self._semaphore.acquire()
+
+        finally:
+            self.waiting -= 1
+
+        started_at: float = monotonic()
+        self.wait_seconds += started_at - queued_at
+        self.running += 1
+
+        try:
+            return await get_running_loop().run_in_executor(self._executor, func, *args)
+
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.run_seconds += monotonic() - started_at
+
+            self._semaphore.release()
+
+    async def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(
+                wait = False
+            )
+
+            self._executor = None
+
+
+password_hashing_pool: PasswordHashingPool = PasswordHashingPool(
+    workers = config.passwords.workers,
+    max_queue = config.passwords.max_queue
+)
+
+
+for metric_name, documentation, metric_type, getter in (
+    ("password_hashing_waiting", "Password hashes waiting for a thread.", "gauge", lambda: password_hashing_pool.waiting),
+    ("password_hashing_running", "Password hashes running.", "gauge", lambda: password_hashing_pool.running),
+    ("password_hashing_completed_total", "Password hashes completed.", "counter", lambda: password_hashing_pool.completed),
+    ("password_hashing_rejected_total", "Password hashes rejected with 503.", "counter", lambda: password_hashing_pool.rejected),
+    ("password_hashing_wait_seconds_total", "Time password hashes spent waiting for a thread.", "counter", lambda: password_hashing_pool.wait_seconds),
+    ("password_hashing_run_seconds_total", "Time spent hashing passwords.", "counter", lambda: password_hashing_pool.run_seconds)
+):
+    metrics_registry.gauge(
+        name = metric_name,
+        documentation = documentation,
+        metric_type = metric_type
+    ).add(getter)
@@ -0,0 +1,591 @@
+from beanie import PydanticObjectId
+from beanie.operators import Set, In
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorCollection
+from asyncio import gather
+
+from app.db import Post, PostReaction
+from app.config import config
+from app import errors, schemas
+from app.utils import get_timestamp
+from app.events import event_hub, build_reactions_changed_event
+
+from typing import Container, Dict, List, NamedTuple, Optional, Union
+
+
+RECONCILE_BATCH_SIZE: int = 1000
+
+# Attempts of one conditional reaction write that keeps losing races to other requests
+WRITE_ATTEMPTS: int = 3
+
+
+class PostReactionChange(NamedTuple):
+    user_id: PydanticObjectId
+    post_id: PydanticObjectId
+    initial_reaction: Optional[str]
+    final_reaction: Optional[str]
+
+
+async def increment_post_reactions(post_id: PydanticObjectId, increments: Dict[str, int]) -> None:
+    post_data: Optional[dict] = await Post.get_motor_collection().find_one_and_update(
+        {
+            "_id": post_id
+        },
+        {
+            "$inc": {
+                **{
+                    f"reactions.{reaction}": increment
+                    for reaction, increment in increments.items()
+                },
+                "version": 1
+            },
+            "$set": {
+                "updated_at": get_timestamp()
+            }
+        },
+        projection = {
+            f"reactions.{reaction}": 1
+            for reaction in increments
+        },
+        return_document = ReturnDocument.AFTER
+    )
+
+    if post_data is not None:
+        event_hub.publish_local(
+            build_reactions_changed_event(
+                post_id = post_id,
+                reactions = post_data.get("reactions", {})
+            )
+        )
+
+
+async def increment_posts_reactions(increments: Dict[PydanticObjectId, Dict[str, int]]) -> None:
+    updated_at: int = get_timestamp()
+
+    await Post.get_motor_collection().bulk_write(
+        [
+            UpdateOne(
+                {
+                    "_id": post_id
+                },
+                {
+                    "$inc": {
+                        **{
+                            f"reactions.{reaction}": increment
+                            for reaction, increment in post_increments.items()
+                        },
+                        "version": 1
+                    },
+                    "$set": {
+                        "updated_at": updated_at
+                    }
+                }
+            )
+            for post_id, post_increments in increments.items()
+        ],
+        ordered = False
+    )
+
+
+async def add_post_reaction(user_id: PydanticObjectId, post_id: PydanticObjectId, reaction: str) -> bool:
+    try:
+        result = await PostReaction.get_motor_collection().update_one(
+            {
+                "user_id": user_id,
+                "post_id": post_id
+            },
+            {
+                "$setOnInsert": {
+                    "user_id": user_id,
+                    "post_id": post_id,
+                    "reaction": reaction,
+                    "created_at": get_timestamp()
+                }
+            },
+            upsert = True
+        )
+
+    except DuplicateKeyError:
+        return False
+
+    if result.upserted_id is None:
+        return False
+
+    await increment_post_reactions(
+        post_id = post_id,
+        increments = {
+            reaction: 1
+        }
+    )
+
+    return True
+
+
+async def change_post_reaction(post_reaction: PostReaction, reaction: str) -> bool:
+    result = await PostReaction.find_one(
+        PostReaction.id == post_reaction.id,
+        PostReaction.reaction == post_reaction.reaction
+    ).update(
+        Set({
+            PostReaction.reaction: reaction
+        })
+    )
+
+    if not result.modified_count:
+        return False
+
+    await increment_post_reactions(
+        post_id = post_reaction.post_id,
+        increments = {
+            post_reaction.reaction: -1,
+            reaction: 1
+        }
+    )
+
+    post_reaction.reaction = reaction
+
+    return True
+
+
+async def remove_post_reaction(post_reaction: PostReaction) -> bool:
+    result = await PostReaction.find_one(
+        PostReaction.id == post_reaction.id,
+        PostReaction.reaction == post_reaction.reaction
+    ).delete()
+
+    if not result.deleted_count:
+        return False
+
+    await increment_post_reactions(
+        post_id = post_reaction.post_id,
+        increments = {
+            post_reaction.reaction: -1
+        }
+    )
+
+    return True
+
+
+async def publish_post_reactions(post_ids: List[PydanticObjectId]) -> None:
+    async for post_data in Post.get_motor_collection().find(
+        {
+            "_id": {
+                "$in": post_ids
+            }
+        },
+        {
+            "reactions": 1
+        }
+    ):
+        event_hub.publish_local(
+            build_reactions_changed_event(
+                post_id = post_data["_id"],
+                reactions = post_data.get("reactions", {})
+            )
+        )
+
+
+async def get_user_post_reactions(user_id: PydanticObjectId, post_ids: List[PydanticObjectId]) -> Dict[PydanticObjectId, str]:
+    return {
+        post_reaction_data["post_id"]: post_reaction_data["reaction"]
+        async for post_reaction_data in PostReaction.get_motor_collection().find(
+            {
+                "user_id": user_id,
+                "post_id": {
+                    "$in": post_ids
+                }
+            },
+            {
+                "_id": 0,
+                "post_id": 1,
+                "reaction": 1
+            }
+        )
+    }
+
+
+async def apply_post_reactions_batch(
+    user_id: PydanticObjectId,
+    post_reactions_creates: List[schemas.PostReactionCreate]
+) -> List[schemas.PostReactionBatchItemRead]:
+    """Applies many reaction changes of one user with one round of concurrent writes.
+
+    Items are evaluated in order with the same rules as a single reaction request, so several items
+    for one post compose; only the final state of each post is written.
+    """
+
+    post_ids: List[PydanticObjectId] = list({
+        post_reaction_create.post_id
+        for post_reaction_create in post_reactions_creates
+    })
+
+    existing_post_ids: Container[PydanticObjectId] = {
+        post_data["_id"]
+        async for post_data in Post.get_motor_collection().find(
+            {
+                "_id": {
+                    "$in": post_ids
+                }
+            },
+            {
+                "_id": 1
+            }
+        )
+    }
+
+    post_reactions: Dict[PydanticObjectId, PostReaction] = {
+        post_reaction.post_id: post_reaction
+        for post_reaction in await PostReaction.find(
+            PostReaction.user_id == user_id,
+            In(PostReaction.post_id, post_ids)
+        ).to_list()
+    }
+
+    initial_reactions: Dict[PydanticObjectId, Optional[str]] = {
+        post_id: (
+            post_reactions[post_id].reaction
+            if post_id in post_reactions
+            else
+            None
+        )
+        for post_id in post_ids
+    }
+
+    current_reactions: Dict[PydanticObjectId, Optional[str]] = dict(initial_reactions)
+    results: List[schemas.PostReactionBatchItemRead] = []
+
+    for post_reaction_create in post_reactions_creates:
+        post_id: PydanticObjectId = post_reaction_create.post_id
+        reaction: Optional[str] = post_reaction_create.reaction
+        error: Optional[str] = None
+        is_added: bool = False
+        is_changed: bool = False
+        is_removed: bool = False
+
+        if post_id not in existing_post_ids:
+            error = errors.ErrorStrings.POST_NOT_FOUND
+
+        elif reaction and reaction not in config.reactions_list:
+            error = errors.ErrorStrings.INVALID_REACTION
+
+        elif not reaction:
+            if current_reactions[post_id] is None:
+                error = errors.ErrorStrings.REACTION_NOT_FOUND
+
+            else:
+                current_reactions[post_id] = None
+                is_removed = True
+
+        elif current_reactions[post_id] is None:
+            current_reactions[post_id] = reaction
+            is_added = True
+
+        elif current_reactions[post_id] != reaction:
+            current_reactions[post_id] = reaction
+            is_changed = True
+
+        results.append(schemas.PostReactionBatchItemRead(
+            post_id = post_id,
+            reaction = reaction,
+            is_added = is_added,
+            is_changed = is_changed,
+            is_removed = is_removed,
+            error = error
+        ))
+
+    await write_post_reaction_changes([
+        PostReactionChange(
+            user_id = user_id,
+            post_id = post_id,
+            initial_reaction = initial_reaction,
+            final_reaction = current_reactions[post_id]
+        )
+        for post_id, initial_reaction in initial_reactions.items()
+        if current_reactions[post_id] != initial_reaction
+    ])
+
+    return results
+
+
+async def write_post_reaction_change(post_reaction_change: PostReactionChange) -> Dict[str, int]:
+    """Writes one change conditionally on the stored reaction and returns the counter increments it applied.
+
+    A change that lost a race is retried from the reaction stored by the winner, so its final state
+    still wins, and only writes that actually happened are counted.
+    """
+
+    user_id, post_id, initial_reaction, final_reaction = post_reaction_change
+
+    for _ in range(WRITE_ATTEMPTS):
+        if initial_reaction == final_reaction:
+            return {}
+
+        if initial_reaction is None:
+            try:
+                result = await PostReaction.get_motor_collection().update_one(
+                    {
+                        "user_id": user_id,
+                        "post_id": post_id
+                    },
+                    {
+                        "$setOnInsert": {
+                            "user_id": user_id,
+                            "post_id": post_id,
+                            "reaction": final_reaction,
+                            "created_at": get_timestamp()
+                        }
+                    },
+                    upsert = True
+                )
+
+                is_applied: bool = result.upserted_id is not None
+
+            except DuplicateKeyError:
+                is_applied = False
+
+        elif final_reaction is None:
+            is_applied = bool((await PostReaction.get_motor_collection().delete_one({
+                "user_id": user_id,
+                "post_id": post_id,
+                "reaction": initial_reaction
+            })).deleted_count)
+
+        else:
+            is_applied = bool((await PostReaction.get_motor_collection().update_one(
+                {
+                    "user_id": user_id,
+                    "post_id": post_id,
+                    "reaction": initial_reaction
+                },
+                {
+                    "$set": {
+                        "reaction": final_reaction
+                    }
+                }
+            )).modified_count)
+
+        if is_applied:
+            return {
+                reaction: increment
+                for reaction, increment in (
+                    (initial_reaction, -1),
+                    (final_reaction, 1)
+                )
+                if reaction is not None
+            }
+
+        post_reaction_data: Optional[dict] = await PostReaction.get_motor_collection().find_one(
+            {
+                "user_id": user_id,
+                "post_id": post_id
+            },
+            {
+                "_id": 0,
+                "reaction": 1
+            }
+        )
+
+        initial_reaction = post_reaction_data and post_reaction_data["reaction"]
+
+    return {}
+
+
+async def write_post_reaction_changes(post_reaction_changes: List[PostReactionChange]) -> List[PydanticObjectId]:
+    """Writes reaction changes of any users concurrently and updates the counters of their posts.
+
+    Every write is conditional on the stored reaction, so the counters only get the increments of
+    writes that happened, with one `bulk_write` for all posts. Returns the ids of the touched posts.
+    """
+
+    if not post_reaction_changes:
+        return []
+
+    results: List[Union[Dict[str, int], BaseException]] = await gather(
+        *(
+            write_post_reaction_change(post_reaction_change)
+            for post_reaction_change in post_reaction_changes
+        ),
+        return_exceptions = True
+    )
+
+    increments: Dict[PydanticObjectId, Dict[str, int]] = {}
+
+    for post_reaction_change, result in zip(post_reaction_changes, results):
+        if isinstance(result, BaseException) or not result:
+            continue
+
+        post_increments: Dict[str, int] = increments.setdefault(post_reaction_change.post_id, {})
+
+        for reaction, increment in result.items():
+            post_increments[reaction] = post_increments.get(reaction, 0) + increment
+
+    # Applied writes are counted even when others failed, the caller then sees the first error
+    if increments:
+        await increment_posts_reactions(
+            increments = increments
+        )
+
+        await publish_post_reactions(
+            post_ids = list(increments)
+        )
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    return list(increments)
+
+
+async def reconcile_post_reactions(post_ids: Optional[List[PydanticObjectId]]=None) -> int:
+    """Rebuilds `Post.reactions` counters from the `post_reactions` collection, for all posts by default."""
+
+    posts_filter: dict = (
+        {}
+        if post_ids is None
+        else
+        {
+            "_id": {
+                "$in": post_ids
+            }
+        }
+    )
+
+    reactions_counts: Dict[PydanticObjectId, Dict[str, int]] = {}
+
+    async for reaction_count in PostReaction.aggregate([
+        {
+            "$match": (
+                {}
+                if post_ids is None
+                else
+                {
+                    "post_id": {
+                        "$in": post_ids
+                    }
+                }
+            )
+        },
+        {
+            "$group": {
+                "_id": {
+                    "post_id": "$post_id",
+                    "reaction": "$reaction"
+                },
+                "count": {
+                    "$sum": 1
+                }
+            }
+        }
+    ]):
+        reactions_counts.setdefault(
+            reaction_count["_id"]["post_id"],
+            {}
+        )[reaction_count["_id"]["reaction"]] = reaction_count["count"]
+
+    posts_collection = Post.get_motor_collection()
+    updates: List[UpdateOne] = []
+    updated_count: int = 0
+
+    async for post_data in posts_collection.find(posts_filter, {"_id": 1}):
+        updates.append(UpdateOne(
+            {
+                "_id": post_data["_id"]
+            },
+            {
+                "$set": {
+                    "reactions": reactions_counts.get(post_data["_id"], {}),
+                    "updated_at": get_timestamp()
+                },
+                "$inc": {
+                    "version": 1
+                }
+            }
+        ))
+
+        if len(updates) >= RECONCILE_BATCH_SIZE:
+            updated_count += (await posts_collection.bulk_write(updates, ordered=False)).modified_count
+            updates = []
+
+    if updates:
+        updated_count += (await posts_collection.bulk_write(updates, ordered=False)).modified_count
+
+    return updated_count
+
+
+async def dedupe_post_reactions(collection: AsyncIOMotorCollection) -> int:
+    """Deletes all but the newest reaction of every (post, user) pair, so that `post_user_unique_index` can be built."""
+
+    deleted_count: int = 0
+
+    async for duplicates in collection.aggregate(
+        [
+            {
+                "$sort": {
+                    "_id": 1
+                }
+            },
+            {
+                "$group": {
+                    "_id": {
+                        "post_id": "$post_id",
+                        "user_id": "$user_id"
+                    },
+                    "ids": {
+                        "$push": "$_id"
+                    }
+                }
+            },
+            {
+                "$match": {
+                    "ids.1": {
+                        "$exists": True
+                    }
+                }
+            }
+        ],
+        allowDiskUse = True
+    ):
+        deleted_count += (await collection.delete_many({
+            "_id": {
+                "$in": duplicates["ids"][:-1]
+            }
+        })).deleted_count
+
+    return deleted_count
+
+
+async def _main() -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app import STARTUP_COROS
+    from app.db import build_client_options
+
+    # Runs before init_db, whose unique index build fails while duplicates are left
+    client: AsyncIOMotorClient = AsyncIOMotorClient(
+        config.db.uri,
+        **build_client_options(
+            db_config = config.db
+        )
+    )
+
+    try:
+        deleted_count: int = await dedupe_post_reactions(
+            collection = client.get_database(config.db.name)[PostReaction.Settings.name]
+        )
+
+    finally:
+        client.close()
+
+    print(f"Deleted {deleted_count} duplicate post reactions.")
+
+    for coro in STARTUP_COROS:
+        await coro
+
+    print(f"Reconciled reaction counters of {await reconcile_post_reactions()} posts.")
+
+
+if __name__ == "__main__":
+    from asyncio import run as run_asyncio
+
+    run_asyncio(_main())
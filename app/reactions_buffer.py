@@ -0,0 +1,279 @@
+from fastapi import HTTPException, status
+from beanie import PydanticObjectId
+from asyncio import Event, Lock, Task, create_task, wait_for, TimeoutError as AsyncTimeoutError
+
+from app.db import Post, PostReaction
+from app.config import config
+from app.metrics import metrics_registry
+from app.cache import TTLCache
+from app.reactions import PostReactionChange, write_post_reaction_changes
+from app.response_cache import response_cache, get_post_cache_tag
+from app import errors, schemas
+
+from typing import Dict, List, Optional, Tuple
+
+
+PendingKey = Tuple[PydanticObjectId, PydanticObjectId]
+
+
+class PendingPostReaction:
+    def __init__(self, initial_reaction: Optional[str]) -> None:
+        self.initial_reaction: Optional[str] = initial_reaction
+        self.reaction: Optional[str] = initial_reaction
+
+
+class ReactionsBuffer:
+    """Write-behind buffer for single reaction requests.
+
+    Changes are kept per (user, post), so a burst of toggles collapses into its final state, and are
+    written together at most `flush_interval` seconds later, or as soon as `max_pending`
+    keys are waiting. Reads of the user's own reactions go through the buffer first.
+    """
+
+    def __init__(self, is_enabled: bool, flush_interval: float, max_pending: int, known_posts_cache: TTLCache) -> None:
+        self.is_enabled: bool = is_enabled
+        self.flush_interval: float = flush_interval
+        self.max_pending: int = max_pending
+        self.known_posts_cache: TTLCache[PydanticObjectId, bool] = known_posts_cache
+        self.flushed_count: int = 0
+        self.written_count: int = 0
+
+        self._pending: Dict[PendingKey, PendingPostReaction] = {}
+        self._flushing: Dict[PendingKey, PendingPostReaction] = {}
+        self._flush_event: Event = Event()
+        self._flush_lock: Lock = Lock()
+        self._flush_task: Optional[Task] = None
+        self._is_stopping: bool = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def is_post_existing(self, post_id: PydanticObjectId) -> bool:
+        # Posts are never deleted, so a positive answer can be remembered
+        if self.known_posts_cache.get(post_id):
+            return True
+
+        is_existing: bool = bool(
+            await Post.get_motor_collection().count_documents(
+                {
+                    "_id": post_id
+                },
+                limit = 1
+            )
+        )
+
+        if is_existing:
+            self.known_posts_cache.set(post_id, True)
+
+        return is_existing
+
+    async def _get_pending(self, user_id: PydanticObjectId, post_id: PydanticObjectId) -> PendingPostReaction:
+        key: PendingKey = (user_id, post_id)
+        pending: Optional[PendingPostReaction] = self._pending.get(key)
+
+        if pending is not None:
+            return pending
+
+        flushing: Optional[PendingPostReaction] = self._flushing.get(key)
+
+        if flushing is not None:
+            current_reaction: Optional[str] = flushing.reaction
+
+        else:
+            post_reaction_data: Optional[dict] = await PostReaction.get_motor_collection().find_one(
+                {
+                    "user_id": user_id,
+                    "post_id": post_id
+                },
+                {
+                    "_id": 0,
+                    "reaction": 1
+                }
+            )
+
+            current_reaction = post_reaction_data and post_reaction_data["reaction"]
+
+        # Another request of the same user may have got here first while we were reading
+        return self._pending.setdefault(key, PendingPostReaction(current_reaction))
+
+    async def record(self, user_id: PydanticObjectId, post_id: PydanticObjectId, reaction: Optional[str]) -> schemas.PostReactionRead:
+        if not await self.is_post_existing(post_id):
+            raise HTTPException(
+                status_code = status.HTTP_404_NOT_FOUND,
+                detail = errors.ErrorStrings.POST_NOT_FOUND
+            )
+
+        if reaction and reaction not in config.reactions_list:
+            raise HTTPException(
+                status_code = status.HTTP_400_BAD_REQUEST,
+                detail = errors.ErrorStrings.INVALID_REACTION
+            )
+
+        pending: PendingPostReaction = await self._get_pending(user_id, post_id)
+
+        is_added: bool = False
+        is_changed: bool = False
+        is_removed: bool = False
+
+        if not reaction:
+            if pending.reaction is None:
+                raise HTTPException(
+                    status_code = status.HTTP_400_BAD_REQUEST,
+                    detail = errors.ErrorStrings.REACTION_NOT_FOUND
+                )
+
+            is_removed = True
+
+        elif pending.reaction is None:
+            is_added = True
+
+        elif pending.reaction != reaction:
+            is_changed = True
+
+        pending.reaction = reaction or None
+
+        if len(self._pending) >= self.max_pending:
+            self._flush_event.set()
+
+        return schemas.PostReactionRead(
+            reaction = reaction,
+            is_added = is_added,
+            is_changed = is_changed,
+            is_removed = is_removed
+        )
+
+    def overlay_user_reactions(
+        self,
+        user_id: PydanticObjectId,
+        post_ids: List[PydanticObjectId],
+        reactions: Dict[PydanticObjectId, str]
+    ) -> Dict[PydanticObjectId, str]:
+        """Applies not yet written changes of the user on top of reactions read from the database."""
+
+        for post_id in post_ids:
+            key: PendingKey = (user_id, post_id)
+            pending: Optional[PendingPostReaction] = self._pending.get(key) or self._flushing.get(key)
+
+            if pending is None:
+                continue
+
+            if pending.reaction is None:
+                reactions.pop(post_id, None)
+
+            else:
+                reactions[post_id] = pending.reaction
+
+        return reactions
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            self._flush_event.clear()
+
+            if not self._pending:
+                return 0
+
+            self._flushing, self._pending = self._pending, {}
+
+            post_reaction_changes: List[PostReactionChange] = [
+                PostReactionChange(
+                    user_id = user_id,
+                    post_id = post_id,
+                    initial_reaction = pending.initial_reaction,
+                    final_reaction = pending.reaction
+                )
+                for (user_id, post_id), pending in self._flushing.items()
+                if pending.reaction != pending.initial_reaction
+            ]
+
+            try:
+                post_ids: List[PydanticObjectId] = await write_post_reaction_changes(post_reaction_changes)
+
+            except Exception:
+                # Keep the changes for the next flush; newer changes of the same keys win
+                for key, flushing in self._flushing.items():
+                    pending: Optional[PendingPostReaction] = self._pending.get(key)
+
+                    if pending is None:
+                        self._pending[key] = flushing
+
+                    else:
+                        pending.initial_reaction = flushing.initial_reaction
+
+                raise
+
+            finally:
+                self._flushing = {}
+
+            if post_ids:
+                await response_cache.invalidate_tags([
+                    get_post_cache_tag(post_id)
+                    for post_id in post_ids
+                ])
+
+            self.flushed_count += 1
+            self.written_count += len(post_reaction_changes)
+
+            return len(post_reaction_changes)
+
+    async def _run_flush(self) -> None:
+        while True:
+            try:
+                await wait_for(
+                    self._flush_event.wait(),
+                    timeout = self.flush_interval
+                )
+
+            except AsyncTimeoutError:
+                pass
+
+            try:
+                await self.flush()
+
+            except Exception as ex:
+                print(f"Reactions buffer flush failed: {ex!r}")
+
+            if self._is_stopping:
+                return
+
+    async def start(self) -> None:
+        if self.is_enabled and self._flush_task is None:
+            self._flush_task = create_task(self._run_flush())
+
+    async def shutdown(self) -> None:
+        if self._flush_task is not None:
+            # Let an ongoing flush finish instead of cancelling it halfway through a write
+            self._is_stopping = True
+            self._flush_event.set()
+
+            await self._flush_task
+
+            self._flush_task = None
+            self._is_stopping = False
+
+        try:
+            await self.flush()
+
+        except Exception as ex:
+            print(f"Reactions buffer final flush failed, {len(self._pending)} changes lost: {ex!r}")
+
+
+reactions_buffer: ReactionsBuffer = ReactionsBuffer(
+    is_enabled = config.reactions_buffer.enabled,
+    flush_interval = config.reactions_buffer.flush_interval,
+    max_pending = config.reactions_buffer.max_pending,
+    known_posts_cache = TTLCache(
+        max_size = config.reactions_buffer.known_posts_cache.max_size,
+        ttl = config.reactions_buffer.known_posts_cache.ttl
+    )
+)
+
+metrics_registry.gauge(
+    name = "reactions_buffer_pending",
+    documentation = "Reaction changes waiting to be written."
+).add(lambda: len(reactions_buffer))
+
+metrics_registry.gauge(
+    name = "reactions_buffer_written_total",
+    documentation = "Reaction changes written by buffer flushes.",
+    metric_type = "counter"
+).add(lambda: reactions_buffer.written_count)
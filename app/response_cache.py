@@ -0,0 +1,281 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import monotonic
+from urllib.parse import urlencode
+from json import dumps as json_dumps, loads as json_loads
+
+from app.config import config, ResponseCacheConfig
+from app.metrics import register_cache_metrics
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class CachedResponse(NamedTuple):
+    content: bytes
+    headers: Dict[str, str]
+
+
+class ResponseCacheBackend(ABC):
+    """Tagged response cache.
+
+    Every `invalidate_tags` call bumps a global generation and stamps it on the invalidated tags.
+    Readers take `get_generation()` before reading the database and pass it to `set`, which skips
+    the write when any of the entry's tags was invalidated since then, so that a response built
+    from data read before a concurrent write is never stored after that write's invalidation.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        ...
+
+    @abstractmethod
+    async def get_generation(self) -> int:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str], generation: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        ...
+
+
+class MemoryResponseCacheBackend(ResponseCacheBackend):
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse, Set[str]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._generation: int = 0
+        self._tag_generations: "OrderedDict[str, int]" = OrderedDict()
+        # Generation of the newest forgotten tag, fills started before it can no longer be checked
+        self._forgotten_generation: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+
+        if entry is None:
+            return
+
+        for tag in entry[2]:
+            tag_keys: Optional[Set[str]] = self._tags.get(tag)
+
+            if tag_keys is not None:
+                tag_keys.discard(key)
+
+                if not tag_keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] <= monotonic():
+            if entry is not None:
+                self._delete(key)
+
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return entry[1]
+
+    async def get_generation(self) -> int:
+        return self._generation
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def _is_stale(self, tags: Set[str], generation: int) -> bool:
+        if generation < self._forgotten_generation:
+            return True
+
+        return any(
+            self._tag_generations.get(tag, 0) > generation
+            for tag in tags
+        )
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str], generation: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+
+        tags = set(tags)
+
+        if generation is not None and self._is_stale(tags, generation):
+            return
+
+        self._delete(key)
+
+        self._entries[key] = (monotonic() + self.ttl, value, tags)
+
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._delete(next(iter(self._entries)))
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        self._generation += 1
+
+        for tag in tags:
+            self._tag_generations[tag] = self._generation
+            self._tag_generations.move_to_end(tag)
+
+            for key in list(self._tags.get(tag, ())):
+                self._delete(key)
+
+        while len(self._tag_generations) > self.max_size:
+            _, self._forgotten_generation = self._tag_generations.popitem(
+                last = False
+            )
+
+
+class RedisResponseCacheBackend(ResponseCacheBackend):
+    """Shares cached responses between workers through any Redis-protocol server."""
+
+    def __init__(self, url: str, ttl: float) -> None:
+        try:
+            from redis.asyncio import Redis
+            from redis.exceptions import WatchError
+
+        except ImportError:
+            raise RuntimeError("The redis response cache backend requires the `redis` package")
+
+        self.ttl: int = max(int(ttl), 1)
+
+        self._redis = Redis.from_url(url)
+        self._watch_error = WatchError
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        content, headers = await self._redis.hmget(f"response:{key}", "content", "headers")
+
+        if content is None:
+            return None
+
+        return CachedResponse(
+            content = content,
+            headers = json_loads(headers)
+        )
+
+    async def get_generation(self) -> int:
+        return int(await self._redis.get("generation") or 0)
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str], generation: Optional[int] = None) -> None:
+        tags = list(tags)
+
+        generation_keys: List[str] = [
+            f"generation:{tag}"
+            for tag in tags
+        ]
+
+        async with self._redis.pipeline(transaction=True) as pipeline:
+            try:
+                if generation is not None and generation_keys:
+                    # An invalidation between the check and EXEC aborts the transaction
+                    await pipeline.watch(*generation_keys)
+
+                    tag_generations: List[Optional[bytes]] = await pipeline.mget(generation_keys)
+
+                    if any(
+                        int(tag_generation or 0) > generation
+                        for tag_generation in tag_generations
+                    ):
+                        return
+
+                pipeline.multi()
+
+                pipeline.hset(
+                    f"response:{key}",
+                    mapping = {
+                        "content": value.content,
+                        "headers": json_dumps(value.headers)
+                    }
+                )
+                pipeline.expire(f"response:{key}", self.ttl)
+
+                for tag in tags:
+                    pipeline.sadd(f"tag:{tag}", key)
+                    pipeline.expire(f"tag:{tag}", self.ttl)
+
+                await pipeline.execute()
+
+            except self._watch_error:
+                pass
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = list(tags)
+
+        if not tags:
+            return
+
+        generation: int = await self._redis.incr("generation")
+
+        # Stamp the tags first, so that fills racing with the deletes below see the new generation
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            for tag in tags:
+                pipeline.set(f"generation:{tag}", generation, ex=self.ttl)
+
+            await pipeline.execute()
+
+        for tag in tags:
+            keys: Set[bytes] = await self._redis.smembers(f"tag:{tag}")
+
+            await self._redis.delete(
+                f"tag:{tag}",
+                *(
+                    b"response:" + key
+                    for key in keys
+                )
+            )
+
+
+def build_response_cache_backend(cache_config: ResponseCacheConfig) -> ResponseCacheBackend:
+    if cache_config.backend == "memory":
+        return MemoryResponseCacheBackend(
+            max_size = cache_config.max_size,
+            ttl = cache_config.ttl
+        )
+
+    if cache_config.backend == "redis":
+        return RedisResponseCacheBackend(
+            url = cache_config.url,
+            ttl = cache_config.ttl
+        )
+
+    raise ValueError(f"Unknown response cache backend: {cache_config.backend}")
+
+
+POSTS_LIST_CACHE_TAG: str = "posts:list"
+
+
+def get_post_cache_tag(post_id: Any) -> str:
+    return f"post:{post_id}"
+
+
+def get_author_cache_tag(author_id: Any) -> str:
+    return f"author:{author_id}"
+
+
+def build_cache_key(route: str, **params: Any) -> str:
+    return f"{route}?" + urlencode(sorted(
+        (name, value)
+        for name, value in params.items()
+        if value is not None
+    ))
+
+
+response_cache: ResponseCacheBackend = build_response_cache_backend(
+    cache_config = config.response_cache
+)
+
+if isinstance(response_cache, MemoryResponseCacheBackend):
+    register_cache_metrics("responses", response_cache)
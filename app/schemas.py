@@ -43,7 +43,9 @@ class PostRead(BaseModel):
     id: Id
     title: str
     content: str
+    is_content_truncated: bool = False
     preview_image_url: Optional[str] = None
+    preview_image_variants_urls: Dict[str, str] = {}
     author: PostAuthorRead
     is_pinned: bool = False
     edited_at: Optional[int] = None
@@ -52,6 +54,7 @@ class PostRead(BaseModel):
 
 class PostReadList(BaseModel):
     posts: List[PostRead]
+    next_cursor: Optional[str] = None
 
 class PostCreate(BaseModel):
     title: str
@@ -74,3 +77,16 @@ class PostReactionRead(BaseModel):
 class PostReactionCreate(BaseModel):
     post_id: Id
     reaction: Union[str, None] = None
+
+class PostReactionBatchCreate(BaseModel):
+    reactions: List[PostReactionCreate]
+
+class PostReactionBatchItemRead(PostReactionRead):
+    post_id: Id
+    error: Optional[str] = None
+
+class PostReactionBatchRead(BaseModel):
+    reactions: List[PostReactionBatchItemRead]
+
+class PostReactionsStateRead(BaseModel):
+    reactions: Dict[str, str]
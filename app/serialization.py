@@ -0,0 +1,59 @@
+from fastapi import Response
+from pydantic import BaseModel
+from bson import ObjectId
+
+from app.config import config
+
+from typing import Any, Type, TypeVar
+
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def is_fast_json_enabled() -> bool:
+    return config.api_fast_json and orjson is not None
+
+
+def build_model(model_type: Type[ModelT], **values: Any) -> ModelT:
+    """Builds a response model from values the app produced itself, skipping validation on the fast path."""
+
+    if is_fast_json_enabled():
+        return model_type.construct(**values)
+
+    return model_type(**values)
+
+
+def _orjson_default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        # Response models have no aliases, so their fields serialize as they are
+        return obj.__dict__
+
+    if isinstance(obj, ObjectId):
+        return str(obj)
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_model_json(model: BaseModel) -> bytes:
+    if is_fast_json_enabled():
+        return orjson.dumps(
+            model,
+            default = _orjson_default
+        )
+
+    return model.json().encode("utf-8")
+
+
+def build_model_response(model: BaseModel) -> Response:
+    """Serializes a response model directly; the route keeps `response_model` for the OpenAPI schema only."""
+
+    return Response(
+        content = dump_model_json(model),
+        media_type = "application/json"
+    )
@@ -0,0 +1,362 @@
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import Response, FileResponse
+from starlette.types import Scope, Receive, Send
+from anyio import open_file
+
+from pathlib import Path
+from hashlib import sha256
+from mimetypes import guess_type
+from os import stat_result as StatResult, PathLike, walk, getpid
+from gzip import compress as gzip_compress
+from re import compile as compile_re, Pattern
+
+from app import constants
+
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import brotli
+
+except ImportError:
+    brotli = None
+
+
+IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL: str = "no-cache"
+
+COMPRESSIBLE_SUFFIXES: Set[str] = {
+    ".css",
+    ".js",
+    ".json",
+    ".svg",
+    ".txt"
+}
+
+CONTENT_ENCODINGS: List[Tuple[str, str]] = [
+    ("br", ".br"),
+    ("gzip", ".gz")
+]
+
+CONTENT_ADDRESSED_FILENAME_RE: Pattern = compile_re(r"^[0-9a-f]{64}(\.[0-9a-z]+)+$")
+RANGE_RE: Pattern = compile_re(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_accepted_encodings(accept_encoding: str) -> Set[str]:
+    accepted_encodings: Set[str] = set()
+
+    for item in accept_encoding.split(","):
+        encoding, *params = item.strip().split(";")
+
+        if any(
+            param.strip() in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+            for param in params
+        ):
+            continue
+
+        accepted_encodings.add(encoding.strip().lower())
+
+    return accepted_encodings
+
+
+def parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Returns the inclusive byte range, `None` for a header we ignore, raises ValueError if unsatisfiable."""
+
+    match = RANGE_RE.match(range_header.strip())
+
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    if match.group(1) == "":
+        suffix_length: int = int(match.group(2))
+
+        if suffix_length == 0:
+            raise ValueError("Unsatisfiable range")
+
+        return max(file_size - suffix_length, 0), file_size - 1
+
+    start: int = int(match.group(1))
+    end: int = int(match.group(2)) if match.group(2) else file_size - 1
+
+    if start >= file_size or end < start:
+        raise ValueError("Unsatisfiable range")
+
+    return start, min(end, file_size - 1)
+
+
+class FileRangeResponse(Response):
+    chunk_size: int = 64 * 1024
+
+    def __init__(
+        self,
+        path: PathLike,
+        start: int,
+        end: int,
+        headers: Dict[str, str],
+        media_type: str,
+        method: str
+    ) -> None:
+        self.path: PathLike = path
+        self.start: int = start
+        self.end: int = end
+        self.status_code: int = 206
+        self.media_type: str = media_type
+        self.background = None
+        self.send_header_only: bool = method.upper() == "HEAD"
+
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+
+        if self.send_header_only:
+            await send({
+                "type": "http.response.body",
+                "body": b"",
+                "more_body": False
+            })
+            return
+
+        remaining: int = self.end - self.start + 1
+
+        async with await open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+
+            while remaining > 0:
+                chunk: bytes = await file.read(min(self.chunk_size, remaining))
+
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0
+                })
+
+        if remaining > 0:
+            await send({
+                "type": "http.response.body",
+                "body": b"",
+                "more_body": False
+            })
+
+
+class StaticAssets(StaticFiles):
+    """`StaticFiles` with fingerprinted URLs, precompressed siblings and byte ranges.
+
+    `build()` hashes every asset outside of `content_addressed_dirnames`, so that templates
+    can link `js/main.<hash>.js` through `url_for()` and browsers can cache it forever.
+    """
+
+    def __init__(self, directory: Path, url_path: str, content_addressed_dirnames: List[str]) -> None:
+        super().__init__(
+            directory = directory
+        )
+
+        self.directory_path: Path = directory
+        self.url_path: str = url_path
+        self.content_addressed_dirnames: List[str] = content_addressed_dirnames
+        self.manifest: Dict[str, str] = {}
+
+        self._fingerprinted_paths: Dict[str, str] = {}
+
+    def build(self) -> None:
+        self.manifest.clear()
+        self._fingerprinted_paths.clear()
+
+        for dirpath, dirnames, filenames in walk(self.directory_path):
+            if Path(dirpath) == self.directory_path:
+                dirnames[:] = [
+                    dirname
+                    for dirname in dirnames
+                    if dirname not in self.content_addressed_dirnames
+                ]
+
+            for filename in filenames:
+                if filename.startswith(".") or filename.endswith((".gz", ".br")):
+                    continue
+
+                self._add_asset(Path(dirpath) / filename)
+
+    def _add_asset(self, filepath: Path) -> None:
+        relative_path: Path = filepath.relative_to(self.directory_path)
+
+        data: bytes = filepath.read_bytes()
+        fingerprinted_path: str = str(relative_path.with_name(
+            f"{filepath.stem}.{sha256(data).hexdigest()[:12]}{filepath.suffix}"
+        ))
+
+        self.manifest[str(relative_path)] = fingerprinted_path
+        self._fingerprinted_paths[fingerprinted_path] = str(relative_path)
+
+        if filepath.suffix in COMPRESSIBLE_SUFFIXES:
+            self._precompress(filepath, data)
+
+    def _precompress(self, filepath: Path, data: bytes) -> None:
+        compressors = [
+            (".gz", lambda data: gzip_compress(data, compresslevel=9, mtime=0))
+        ]
+
+        if brotli is not None:
+            compressors.append(
+                (".br", lambda data: brotli.compress(data, quality=11))
+            )
+
+        for suffix, compress in compressors:
+            compressed_filepath: Path = filepath.with_name(filepath.name + suffix)
+
+            if compressed_filepath.is_file() and compressed_filepath.stat().st_mtime >= filepath.stat().st_mtime:
+                continue
+
+            compressed_data: bytes = compress(data)
+
+            if len(compressed_data) < len(data):
+                # Other workers may be serving the sibling, so it is swapped in whole
+                temp_filepath: Path = filepath.with_name(f".{compressed_filepath.name}.{getpid()}.tmp")
+
+                temp_filepath.write_bytes(compressed_data)
+                temp_filepath.replace(compressed_filepath)
+
+    def url_for(self, path: str) -> str:
+        return f"{self.url_path}/{self.manifest.get(path, path)}"
+
+    def get_path(self, scope: Scope) -> str:
+        path: str = super().get_path(scope)
+
+        return self._fingerprinted_paths.get(path, path)
+
+    def is_immutable(self, scope: Scope) -> bool:
+        path: str = super().get_path(scope)
+
+        return (
+            path in self._fingerprinted_paths
+            or
+            bool(CONTENT_ADDRESSED_FILENAME_RE.match(Path(path).name))
+        )
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: StatResult,
+        scope: Scope,
+        status_code: int = 200
+    ) -> Response:
+        method: str = scope["method"]
+        request_headers: Headers = Headers(scope=scope)
+        media_type: str = guess_type(str(full_path))[0] or "text/plain"
+
+        headers: Dict[str, str] = {
+            "cache-control": (
+                IMMUTABLE_CACHE_CONTROL
+                if status_code == 200 and self.is_immutable(scope)
+                else
+                REVALIDATE_CACHE_CONTROL
+            ),
+            "accept-ranges": "bytes"
+        }
+
+        is_compressible: bool = Path(full_path).suffix in COMPRESSIBLE_SUFFIXES
+
+        if is_compressible:
+            headers["vary"] = "Accept-Encoding"
+
+            accepted_encodings: Set[str] = get_accepted_encodings(request_headers.get("accept-encoding", ""))
+
+            for encoding, suffix in CONTENT_ENCODINGS:
+                if encoding not in accepted_encodings:
+                    continue
+
+                compressed_path: Path = Path(f"{full_path}{suffix}")
+
+                try:
+                    compressed_stat_result: StatResult = compressed_path.stat()
+
+                except FileNotFoundError:
+                    continue
+
+                headers["content-encoding"] = encoding
+                del headers["accept-ranges"]
+
+                full_path, stat_result = compressed_path, compressed_stat_result
+                break
+
+        response: FileResponse = FileResponse(
+            full_path,
+            status_code = status_code,
+            headers = headers,
+            media_type = media_type,
+            stat_result = stat_result,
+            method = method
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return Response(
+                status_code = 304,
+                headers = {
+                    name: value
+                    for name, value in response.headers.items()
+                    if name in ("cache-control", "etag", "last-modified", "vary", "content-encoding")
+                }
+            )
+
+        range_header: Optional[str] = request_headers.get("range")
+
+        if (
+            range_header is None
+            or status_code != 200
+            or "content-encoding" in headers
+            or request_headers.get("if-range", response.headers["etag"]) not in (
+                response.headers["etag"],
+                response.headers["last-modified"]
+            )
+        ):
+            return response
+
+        try:
+            byte_range: Optional[Tuple[int, int]] = parse_range(range_header, stat_result.st_size)
+
+        except ValueError:
+            return Response(
+                status_code = 416,
+                headers = {
+                    "content-range": f"bytes */{stat_result.st_size}"
+                }
+            )
+
+        if byte_range is None:
+            return response
+
+        start, end = byte_range
+
+        return FileRangeResponse(
+            path = full_path,
+            start = start,
+            end = end,
+            headers = {
+                **{
+                    name: value
+                    for name, value in response.headers.items()
+                    if name not in ("content-length", "content-type")
+                },
+                "content-range": f"bytes {start}-{end}/{stat_result.st_size}",
+                "content-length": str(end - start + 1)
+            },
+            media_type = media_type,
+            method = method
+        )
+
+
+static_assets: StaticAssets = StaticAssets(
+    directory = constants.parent_dirpath / "static",
+    url_path = "/static",
+    content_addressed_dirnames = [
+        constants.static_posts_dirpath.name
+    ]
+)
@@ -0,0 +1,137 @@
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from pathlib import Path
+from hashlib import sha256
+
+from app import errors
+
+from typing import BinaryIO, Optional, Tuple
+
+
+UPLOAD_CHUNK_SIZE: int = 64 * 1024
+
+# Room for multipart boundaries, part headers and the other form fields around an upload
+MULTIPART_OVERHEAD_SIZE: int = 64 * 1024
+
+
+def _raise_too_large() -> None:
+    raise HTTPException(
+        status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail = errors.ErrorStrings.FILE_TOO_LARGE
+    )
+
+
+async def stream_upload_file(upload_file: UploadFile, filepath: Path, max_size: int) -> Tuple[int, str]:
+    """Streams `upload_file` into `filepath` off the event loop, returns the written size and its SHA-256."""
+
+    if upload_file.size is not None and upload_file.size > max_size:
+        _raise_too_large()
+
+    file: BinaryIO = await run_in_threadpool(filepath.open, "wb")
+    file_hash = sha256()
+    size: int = 0
+
+    try:
+        while True:
+            chunk: bytes = await upload_file.read(UPLOAD_CHUNK_SIZE)
+
+            if not chunk:
+                break
+
+            size += len(chunk)
+
+            if size > max_size:
+                _raise_too_large()
+
+            file_hash.update(chunk)
+
+            await run_in_threadpool(file.write, chunk)
+
+        await run_in_threadpool(file.close)
+
+    except BaseException:
+        await run_in_threadpool(file.close)
+        await run_in_threadpool(filepath.unlink, True)
+        raise
+
+    return size, file_hash.hexdigest()
+
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+
+class RequestBodyLimitMiddleware:
+    """Answers 413 to request bodies above `max_size` before routes parse them.
+
+    Multipart parsing spools the whole body before a route runs, so the limit has to be enforced
+    here: a declared `Content-Length` is checked upfront, and chunked bodies are counted as they
+    arrive, reading stops at the first chunk past the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int) -> None:
+        self.app: ASGIApp = app
+        self.max_size: int = max_size
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await JSONResponse(
+            status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content = {
+                "detail": errors.ErrorStrings.FILE_TOO_LARGE.value
+            }
+        )(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length: Optional[str] = Headers(scope=scope).get("content-length")
+
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_size:
+            await self._reject(scope, receive, send)
+            return
+
+        received_size: int = 0
+        is_too_large: bool = False
+        is_response_started: bool = False
+
+        async def limited_receive() -> Message:
+            nonlocal received_size, is_too_large
+
+            message: Message = await receive()
+
+            if message["type"] == "http.request":
+                received_size += len(message.get("body", b""))
+
+                if received_size > self.max_size:
+                    is_too_large = True
+                    raise RequestBodyTooLarge()
+
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal is_response_started
+
+            # Whatever the app answers to the interrupted body is replaced by 413 below
+            if is_too_large:
+                return
+
+            if message["type"] == "http.response.start":
+                is_response_started = True
+
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+
+        except Exception:
+            if not is_too_large:
+                raise
+
+        if is_too_large and not is_response_started:
+            await self._reject(scope, receive, send)
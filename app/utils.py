@@ -1,5 +1,36 @@
 from time import time
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from binascii import Error as BinasciiError
+from json import dumps as json_dumps, loads as json_loads
+
+from typing import Any, List
 
 
 def get_timestamp() -> int:
     return int(time())
+
+
+def encode_cursor(values: List[Any]) -> str:
+    return urlsafe_b64encode(
+        json_dumps(
+            values,
+            separators = (",", ":")
+        ).encode("utf-8")
+    ).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json_loads(
+            urlsafe_b64decode(
+                cursor + "=" * (-len(cursor) % 4)
+            )
+        )
+
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    return values
@@ -1,16 +1,42 @@
-$.ajax({
-    url: "/api/posts/list",
-    type: "GET",
-    async: false,
-    success: function(data) {
-        for (const post_data of data.posts) {
-            console.log(post_data);
-            if (post_data.preview_image_url) {
-                var img = `<img src="${post_data.preview_image_url}" style="max-width:100px;width:100%">`;
-            } else {
-                var img = "";
+function render_post(post_data) {
+    var post = $(`<li><div class="post"><div class="post_header"><h3 class="post_title_h"><a></a></h3><h3 class="post_datetime"></h3></div><div class="post_author"><span>Author:<a role="link"></a></span></div><div class="post_content"><p></p></div><div class="post_buttons"><div class="post_button_reactions"></div></div></div></li>`);
+
+    post.find(".post_title_h a").attr("href", `/post/${post_data.id}`).text(post_data.title);
+    post.find(".post_datetime").text(post_data.created_at);
+    post.find(".post_author a").attr("href", `/user/${post_data.author.username}`).text(post_data.author.username);
+    post.find(".post_content p").text(post_data.content + (post_data.is_content_truncated ? "…" : ""));
+
+    if (post_data.preview_image_url) {
+        post.find(".post_content").prepend(
+            $(`<img style="max-width:100px;width:100%">`).attr("src", post_data.preview_image_variants_urls.thumbnail || post_data.preview_image_url)
+        );
+    }
+
+    return post;
+}
+
+$("#posts_load_more").on("click", function() {
+    var button = $(this);
+    var posts = $("#posts");
+
+    button.prop("disabled", true);
+
+    $.ajax({
+        url: "/api/posts/list",
+        type: "GET",
+        data: {
+            cursor: posts.attr("data-next-cursor")
+        },
+        success: function(data) {
+            for (const post_data of data.posts) {
+                posts.append(render_post(post_data));
             }
-            $("#posts").append(`<li><div class="post"><div class="post_header"><h3 class="post_title_h"><a href="/post/${post_data.id}">${post_data.title}</a></h3><h3 class="post_datetime">${post_data.created_at}</h3></div><div class="post_author"><span>Author:<a role="link" href="/user/${post_data.author.username}">${post_data.author.username}</a></span></div><div class="post_content">${img}<p>${post_data.content}</p></div><div class="post_buttons"><div class="post_button_reactions"></div></div></div></li>`);
+
+            posts.attr("data-next-cursor", data.next_cursor || "");
+            button.prop("hidden", !data.next_cursor);
+        },
+        complete: function() {
+            button.prop("disabled", false);
         }
-    }
+    });
 });
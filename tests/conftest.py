@@ -0,0 +1,84 @@
+import pytest
+
+from asyncio import run
+from importlib.util import find_spec
+from os import environ
+from uuid import uuid4
+
+from typing import Awaitable, Callable, List, TypeVar
+
+
+REQUIRED_MODULES: List[str] = [
+    "fastapi",
+    "beanie",
+    "motor",
+    "fastapi_users"
+]
+
+# Importing `app` builds the whole application, so the suite needs the full requirements installed
+if not all(find_spec(module_name) for module_name in REQUIRED_MODULES):
+    collect_ignore_glob: List[str] = [
+        "test_*.py"
+    ]
+
+
+ResultT = TypeVar("ResultT")
+
+RunWithDB = Callable[[Callable[[], Awaitable[ResultT]]], ResultT]
+
+
+@pytest.fixture
+def db_config():
+    """Configured database settings pointed at `PYBLOG_TEST_MONGODB_URI` and a scratch database name."""
+
+    from app.config import config
+
+    return config.db.copy(
+        update = {
+            "uri": environ.get("PYBLOG_TEST_MONGODB_URI", config.db.uri),
+            "name": f"pyblog_test_{uuid4().hex}",
+            "server_selection_timeout_ms": 2000
+        }
+    )
+
+
+@pytest.fixture
+def run_with_db(db_config) -> RunWithDB:
+    """Runs a scenario against the scratch database of `db_config`.
+
+    The test is skipped when no server answers; the database is dropped afterwards.
+    """
+
+    from pymongo.errors import ServerSelectionTimeoutError
+
+    from app.db import init_db
+    from app.authors import authors_cache, authors_ids_cache
+    from app.response_cache import response_cache, MemoryResponseCacheBackend
+
+    def run_with_db(scenario: Callable[[], Awaitable[ResultT]]) -> ResultT:
+        async def main() -> ResultT:
+            try:
+                client = await init_db(
+                    db_config = db_config
+                )
+
+            except ServerSelectionTimeoutError:
+                pytest.skip(f"MongoDB is not reachable at {db_config.uri}")
+
+            try:
+                return await scenario()
+
+            finally:
+                await client.drop_database(db_config.name)
+                client.close()
+
+        # Process-wide caches would leak documents of the previous scratch database
+        authors_cache.clear()
+        authors_ids_cache.clear()
+
+        if isinstance(response_cache, MemoryResponseCacheBackend):
+            response_cache.clear()
+
+        return run(main())
+
+    return run_with_db
@@ -0,0 +1,21 @@
+import pytest
+
+from pydantic import ValidationError
+
+from app.config import DBConfig, ReadPreferenceName
+from app.db import READ_PREFERENCES
+
+from typing import get_args
+
+
+def test_unknown_read_preference_names_the_setting() -> None:
+    with pytest.raises(ValidationError, match="feed_read_preference"):
+        DBConfig(
+            uri = "mongodb://localhost:27017",
+            name = "pyblog",
+            feed_read_preference = "secondry"
+        )
+
+
+def test_every_read_preference_name_is_mapped() -> None:
+    assert set(get_args(ReadPreferenceName)) == set(READ_PREFERENCES)
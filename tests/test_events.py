@@ -0,0 +1,133 @@
+import pytest
+
+from asyncio import Queue, gather, run
+
+from app.events import EventHub, RESET_EVENT, Subscription, build_post_created_event, format_sse
+
+from typing import Any, AsyncIterator, Dict, List
+
+
+SUBSCRIBERS_COUNT: int = 1000
+
+
+class CountingQueue(Queue):
+    puts_count: int = 0
+
+    def put_nowait(self, item: Any) -> None:
+        CountingQueue.puts_count += 1
+
+        super().put_nowait(item)
+
+
+def build_hub(queue_size: int=4) -> EventHub:
+    return EventHub(
+        queue_size = queue_size,
+        keepalive_interval = 60,
+        source = "local"
+    )
+
+
+async def read_stream(stream: AsyncIterator[str]) -> List[str]:
+    return [
+        message
+        async for message in stream
+    ]
+
+
+def test_publish_puts_once_per_subscriber(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("app.events.Queue", CountingQueue)
+    monkeypatch.setattr(CountingQueue, "puts_count", 0)
+
+    async def scenario() -> List[Subscription]:
+        hub: EventHub = build_hub()
+
+        subscriptions: List[Subscription] = [
+            hub.subscribe()
+            for _ in range(SUBSCRIBERS_COUNT)
+        ]
+
+        # Nobody reads in between: publishing must not wait for subscribers
+        for index in range(3):
+            hub.publish(build_post_created_event(index))
+
+        return subscriptions
+
+    subscriptions: List[Subscription] = run(scenario())
+
+    assert CountingQueue.puts_count == 3 * SUBSCRIBERS_COUNT
+    assert all(subscription.queue.qsize() == 3 for subscription in subscriptions)
+
+
+def test_overflowed_subscriber_gets_reset() -> None:
+    async def scenario() -> List[str]:
+        hub: EventHub = build_hub(
+            queue_size = 2
+        )
+
+        slow_subscription: Subscription = hub.subscribe()
+        fast_subscription: Subscription = hub.subscribe()
+
+        events: List[Dict[str, Any]] = [
+            build_post_created_event(index)
+            for index in range(3)
+        ]
+
+        for event in events:
+            hub.publish(event)
+
+            # The fast subscriber keeps up, the slow one falls behind
+            fast_subscription.queue.get_nowait()
+
+        assert slow_subscription.is_overflowed
+        assert not fast_subscription.is_overflowed
+        assert len(hub) == 1
+
+        return await read_stream(hub.stream(slow_subscription))
+
+    messages: List[str] = run(scenario())
+
+    assert messages == [
+        format_sse(event["type"], event)
+        for event in [
+            build_post_created_event(0),
+            build_post_created_event(1)
+        ]
+    ] + [
+        format_sse(RESET_EVENT, {})
+    ]
+
+
+def test_subscribers_are_released_after_streams_close() -> None:
+    async def scenario() -> None:
+        hub: EventHub = build_hub()
+
+        streams: List[AsyncIterator[str]] = [
+            hub.stream(hub.subscribe())
+            for _ in range(SUBSCRIBERS_COUNT)
+        ]
+
+        assert len(hub) == SUBSCRIBERS_COUNT
+
+        hub.publish(build_post_created_event("post"))
+
+        # Half of the clients disconnect after the first event
+        for stream in streams[::2]:
+            await stream.__anext__()
+            await stream.aclose()
+
+        assert len(hub) == SUBSCRIBERS_COUNT // 2
+
+        # The rest are closed by the server on shutdown
+        readers = gather(*(
+            read_stream(stream)
+            for stream in streams[1::2]
+        ))
+
+        await hub.shutdown()
+
+        for messages in await readers:
+            assert messages[-1] == format_sse(RESET_EVENT, {"type": RESET_EVENT})
+
+        assert len(hub) == 0
+
+    run(scenario())
@@ -0,0 +1,184 @@
+import pytest
+
+from beanie import PydanticObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.db import Post, PostListView, PostReaction, init_db
+from app.reactions import dedupe_post_reactions
+from app.api import posts as posts_api
+
+from typing import Any, List, Set, Tuple
+
+
+def get_plan_stages(plan: Any) -> Tuple[Set[str], Set[str]]:
+    """Collects stage names and index names of an explain plan, classic and SBE shapes alike."""
+
+    stages: Set[str] = set()
+    index_names: Set[str] = set()
+
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+
+        if "indexName" in plan:
+            index_names.add(plan["indexName"])
+
+        values: List[Any] = list(plan.values())
+
+    elif isinstance(plan, list):
+        values = plan
+
+    else:
+        values = []
+
+    for value in values:
+        value_stages, value_index_names = get_plan_stages(value)
+
+        stages |= value_stages
+        index_names |= value_index_names
+
+    return stages, index_names
+
+
+async def explain_winning_plan(cursor) -> Tuple[Set[str], Set[str]]:
+    explanation: dict = await cursor.explain()
+
+    return get_plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+
+async def seed_posts() -> PydanticObjectId:
+    author_id: PydanticObjectId = PydanticObjectId()
+
+    await Post.insert_many([
+        Post(
+            title = f"Post {index}",
+            content = "Content",
+            author_id = author_id if index % 2 else PydanticObjectId(),
+            created_at = 1_000_000 + index
+        )
+        for index in range(40)
+    ])
+
+    return author_id
+
+
+def test_feed_pages_are_served_by_their_indexes(run_with_db) -> None:
+    async def scenario() -> List[Tuple[Set[str], Set[str]]]:
+        author_id: PydanticObjectId = await seed_posts()
+
+        first_page = posts_api.build_posts_query(
+            offset = 0,
+            limit = 10,
+            cursor = None
+        )
+
+        last_post: dict = (await posts_api.build_posts_query(
+            offset = 0,
+            limit = 10,
+            cursor = None
+        ).to_list(None))[-1]
+
+        cursor_page = posts_api.build_posts_query(
+            offset = 0,
+            limit = 10,
+            cursor = posts_api.encode_posts_cursor(
+                post = PostListView.parse_obj(last_post)
+            )
+        )
+
+        author_page = posts_api.build_posts_query(
+            offset = 0,
+            limit = 10,
+            cursor = None,
+            posts_filter = posts_api.build_posts_filter(
+                author_id = author_id
+            )
+        )
+
+        return [
+            await explain_winning_plan(first_page),
+            await explain_winning_plan(cursor_page),
+            await explain_winning_plan(author_page)
+        ]
+
+    first_page_plan, cursor_page_plan, author_page_plan = run_with_db(scenario)
+
+    for (stages, index_names), index_name in (
+        (first_page_plan, "feed_index"),
+        (cursor_page_plan, "feed_index"),
+        (author_page_plan, "author_feed_index")
+    ):
+        assert index_name in index_names
+        # The index order is the page order, so no blocking sort
+        assert "SORT" not in stages
+        assert "COLLSCAN" not in stages
+
+
+def test_reaction_lookup_is_served_by_unique_index(run_with_db) -> None:
+    async def scenario() -> Tuple[Set[str], Set[str]]:
+        post_id: PydanticObjectId = PydanticObjectId()
+        user_id: PydanticObjectId = PydanticObjectId()
+
+        await PostReaction(
+            post_id = post_id,
+            user_id = user_id,
+            reaction = "like"
+        ).insert()
+
+        with pytest.raises(DuplicateKeyError):
+            await PostReaction.get_motor_collection().insert_one({
+                "post_id": post_id,
+                "user_id": user_id,
+                "reaction": "dislike"
+            })
+
+        return await explain_winning_plan(
+            PostReaction.get_motor_collection().find({
+                "user_id": user_id,
+                "post_id": post_id
+            })
+        )
+
+    stages, index_names = run_with_db(scenario)
+
+    assert "post_user_unique_index" in index_names
+    assert "COLLSCAN" not in stages
+
+
+def test_duplicate_reactions_are_named_and_deduped(run_with_db, db_config) -> None:
+    async def scenario() -> List[dict]:
+        collection = PostReaction.get_motor_collection()
+        post_id: PydanticObjectId = PydanticObjectId()
+        user_id: PydanticObjectId = PydanticObjectId()
+
+        # Data written before the unique index existed
+        await collection.drop_index("post_user_unique_index")
+        await collection.insert_many([
+            {
+                "post_id": post_id,
+                "user_id": user_id,
+                "reaction": reaction
+            }
+            for reaction in ("like", "dislike", "like")
+        ])
+
+        with pytest.raises(RuntimeError, match="post_reactions.post_user_unique_index"):
+            await init_db(
+                db_config = db_config
+            )
+
+        assert await dedupe_post_reactions(
+            collection = collection
+        ) == 2
+
+        client = await init_db(
+            db_config = db_config
+        )
+        client.close()
+
+        return await collection.find({}, {"_id": 0}).to_list(None)
+
+    post_reactions: List[dict] = run_with_db(scenario)
+
+    assert len(post_reactions) == 1
+    assert post_reactions[0]["reaction"] == "like"
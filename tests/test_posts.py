@@ -0,0 +1,152 @@
+import pytest
+
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+
+from app.db import User, Post
+from app.metrics import RequestStats, request_stats_var
+from app.api import posts as posts_api
+from app.authors import authors_cache
+from app.utils import encode_cursor
+
+from typing import Any, List, Optional, Tuple
+
+
+AUTHORS_COUNT: int = 5
+PAGES_COUNT: int = 3
+
+
+async def seed_posts(posts_count: int) -> List[User]:
+    authors: List[User] = [
+        await User(
+            username = f"author{index}",
+            email = f"author{index}@example.com",
+            hashed_password = "-"
+        ).insert()
+        for index in range(AUTHORS_COUNT)
+    ]
+
+    await Post.insert_many([
+        Post(
+            title = f"Post {index}",
+            content = "Content " * 20,
+            author_id = authors[index % AUTHORS_COUNT].id,
+            created_at = 1_000_000 + index
+        )
+        for index in range(posts_count)
+    ])
+
+    return authors
+
+
+async def read_page(
+    limit: int,
+    cursor: Optional[str]=None,
+    author_id: Optional[PydanticObjectId]=None,
+    is_authors_cached: bool=False
+) -> Tuple[List[str], Optional[str]]:
+    """Reads one feed page and returns the names of the MongoDB commands it issued, and the next cursor."""
+
+    if not is_authors_cached:
+        authors_cache.clear()
+
+    request_stats: RequestStats = RequestStats()
+    request_stats_var.set(request_stats)
+
+    try:
+        post_read_list, _ = await posts_api.get_post_read_list(
+            offset = 0,
+            limit = limit,
+            cursor = cursor,
+            posts_filter = posts_api.build_posts_filter(
+                author_id = author_id
+            )
+        )
+
+    finally:
+        request_stats_var.set(None)
+
+    if author_id is None:
+        assert len(post_read_list.posts) == limit
+
+    return [
+        command_name
+        for command_name, _ in request_stats.db_commands
+    ], post_read_list.next_cursor
+
+
+@pytest.mark.parametrize("page_size", [1, 10, 50])
+def test_feed_page_queries_do_not_grow_with_page_size(run_with_db, page_size: int) -> None:
+    async def scenario() -> List[List[str]]:
+        authors: List[User] = await seed_posts(
+            posts_count = page_size * PAGES_COUNT
+        )
+
+        first_page_commands, next_cursor = await read_page(
+            limit = page_size
+        )
+        cached_first_page_commands, _ = await read_page(
+            limit = page_size,
+            is_authors_cached = True
+        )
+        second_page_commands, _ = await read_page(
+            limit = page_size,
+            cursor = next_cursor
+        )
+        author_page_commands, _ = await read_page(
+            limit = page_size,
+            author_id = authors[0].id
+        )
+
+        return [first_page_commands, cached_first_page_commands, second_page_commands, author_page_commands]
+
+    first_page_commands, cached_first_page_commands, second_page_commands, author_page_commands = run_with_db(scenario)
+
+    # The same commands for 1, 10 or 50 posts: one query for the posts and one batched query for their authors
+    assert first_page_commands == ["find", "find"]
+    assert second_page_commands == ["find", "find"]
+    assert author_page_commands == ["find", "find"]
+    # And only the posts query once the authors are cached
+    assert cached_first_page_commands == ["find"]
+
+
+@pytest.mark.parametrize("values", [
+    [True, 1_000_000, {"$gt": ""}],
+    [{"$ne": None}, 1_000_000, str(PydanticObjectId())],
+    [False, "1000000", str(PydanticObjectId())],
+    [False, True, str(PydanticObjectId())],
+    [False, 1_000_000, "not an id"],
+    [False, 1_000_000]
+])
+def test_posts_cursor_with_wrong_types_is_rejected(values: List[Any]) -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        posts_api.decode_posts_cursor(encode_cursor(values))
+
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("decode, values", [
+    (posts_api.decode_filtered_posts_cursor, [{"$gt": 0}, str(PydanticObjectId())]),
+    (posts_api.decode_filtered_posts_cursor, [1.5, str(PydanticObjectId())]),
+    (posts_api.decode_search_cursor, ["1.5", str(PydanticObjectId())]),
+    (posts_api.decode_search_cursor, [1.5, 1])
+])
+def test_filtered_and_search_cursors_with_wrong_types_are_rejected(decode, values: List[Any]) -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        decode(encode_cursor(values))
+
+    assert exc_info.value.status_code == 400
+
+
+def test_posts_cursor_round_trip() -> None:
+    post_id: PydanticObjectId = PydanticObjectId()
+
+    cursor_filter: dict = posts_api.decode_posts_cursor(encode_cursor([True, 1_000_000, str(post_id)]))
+
+    assert cursor_filter["$or"][2] == {
+        "is_pinned": True,
+        "created_at": 1_000_000,
+        "_id": {
+            "$lt": post_id
+        }
+    }
@@ -0,0 +1,185 @@
+import pytest
+
+from fastapi import HTTPException
+from beanie import PydanticObjectId
+from asyncio import gather
+from random import Random
+from types import SimpleNamespace
+
+from app.db import Post
+from app.config import config
+from app.api import posts as posts_api
+from app.reactions_buffer import reactions_buffer
+from app import reactions, schemas
+
+from typing import Dict, List, Optional, Tuple
+
+
+USERS_COUNT: int = 6
+REQUESTS_COUNT: int = 300
+
+
+@pytest.fixture(autouse=True)
+def direct_reactions(monkeypatch) -> None:
+    # These tests cover the direct write path; buffered writes are covered by their own tests
+    monkeypatch.setattr(reactions_buffer, "is_enabled", False)
+
+
+async def set_reaction(user_id: PydanticObjectId, post_id: PydanticObjectId, reaction: Optional[str]) -> None:
+    """Calls `POST /posts/reaction` as its route function, the way FastAPI does after resolving the user."""
+
+    try:
+        await posts_api.new_post_route(
+            user = SimpleNamespace(
+                id = user_id
+            ),
+            post_reaction_create = schemas.PostReactionCreate(
+                post_id = post_id,
+                reaction = reaction
+            )
+        )
+
+    except HTTPException as ex:
+        # Removing a reaction that another request already removed
+        if ex.status_code != 400:
+            raise
+
+
+def build_requests(random: Random) -> List[Tuple[PydanticObjectId, Optional[str]]]:
+    user_ids: List[PydanticObjectId] = [
+        PydanticObjectId()
+        for _ in range(USERS_COUNT)
+    ]
+
+    # Few users and many requests, so that most requests race with another one of the same user
+    return [
+        (
+            random.choice(user_ids),
+            random.choice([None, *config.reactions_list])
+        )
+        for _ in range(REQUESTS_COUNT)
+    ]
+
+
+async def get_counters(post_id: PydanticObjectId) -> Dict[str, int]:
+    post: Post = await Post.get(post_id)
+
+    return {
+        reaction: count
+        for reaction, count in post.reactions.items()
+        if count
+    }
+
+
+async def create_post() -> Post:
+    return await Post(
+        title = "Reactions",
+        content = "Concurrent reactions",
+        author_id = PydanticObjectId()
+    ).insert()
+
+
+def test_concurrent_single_reactions_keep_counters_exact(run_with_db) -> None:
+    async def scenario() -> Tuple[Dict[str, int], Dict[str, int]]:
+        post: Post = await create_post()
+
+        await gather(*(
+            set_reaction(
+                user_id = user_id,
+                post_id = post.id,
+                reaction = reaction
+            )
+            for user_id, reaction in build_requests(Random(2))
+        ))
+
+        counters: Dict[str, int] = await get_counters(post.id)
+
+        await reactions.reconcile_post_reactions(
+            post_ids = [
+                post.id
+            ]
+        )
+
+        return counters, await get_counters(post.id)
+
+    counters, reconciled_counters = run_with_db(scenario)
+
+    assert counters == reconciled_counters
+    assert all(count > 0 for count in counters.values())
+
+
+def test_concurrent_batches_keep_counters_exact(run_with_db) -> None:
+    async def scenario() -> Tuple[Dict[str, int], Dict[str, int]]:
+        post: Post = await create_post()
+        random: Random = Random(3)
+
+        # Every batch belongs to another user and composes several changes of the same post
+        await gather(*(
+            reactions.apply_post_reactions_batch(
+                user_id = PydanticObjectId(),
+                post_reactions_creates = [
+                    schemas.PostReactionCreate(
+                        post_id = post.id,
+                        reaction = random.choice([None, *config.reactions_list])
+                    )
+                    for _ in range(random.randint(1, 4))
+                ]
+            )
+            for _ in range(REQUESTS_COUNT // 4)
+        ))
+
+        counters: Dict[str, int] = await get_counters(post.id)
+
+        await reactions.reconcile_post_reactions(
+            post_ids = [
+                post.id
+            ]
+        )
+
+        return counters, await get_counters(post.id)
+
+    counters, reconciled_counters = run_with_db(scenario)
+
+    assert counters == reconciled_counters
+
+
+def test_concurrent_batches_and_single_requests_of_same_users_keep_counters_exact(run_with_db) -> None:
+    async def scenario() -> Tuple[Dict[str, int], Dict[str, int]]:
+        post: Post = await create_post()
+        writes = []
+
+        # The same few users send batches and single requests at once, so conditional writes conflict
+        for index, (user_id, reaction) in enumerate(build_requests(Random(4))):
+            if index % 2:
+                writes.append(reactions.apply_post_reactions_batch(
+                    user_id = user_id,
+                    post_reactions_creates = [
+                        schemas.PostReactionCreate(
+                            post_id = post.id,
+                            reaction = reaction
+                        )
+                    ]
+                ))
+
+            else:
+                writes.append(set_reaction(
+                    user_id = user_id,
+                    post_id = post.id,
+                    reaction = reaction
+                ))
+
+        await gather(*writes)
+
+        counters: Dict[str, int] = await get_counters(post.id)
+
+        await reactions.reconcile_post_reactions(
+            post_ids = [
+                post.id
+            ]
+        )
+
+        return counters, await get_counters(post.id)
+
+    counters, reconciled_counters = run_with_db(scenario)
+
+    assert counters == reconciled_counters
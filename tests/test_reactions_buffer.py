@@ -0,0 +1,135 @@
+from beanie import PydanticObjectId
+
+from app.db import Post, PostReaction
+from app.config import config
+from app.cache import TTLCache
+from app.reactions_buffer import ReactionsBuffer
+
+from typing import Dict, List, Optional, Tuple
+
+
+LIKE: str = config.reactions_list[0]
+DISLIKE: str = config.reactions_list[1]
+
+
+def build_buffer() -> ReactionsBuffer:
+    # Flushes only when asked to, so that tests see the pending state
+    return ReactionsBuffer(
+        is_enabled = True,
+        flush_interval = 60,
+        max_pending = 1000,
+        known_posts_cache = TTLCache(
+            max_size = 16,
+            ttl = 60
+        )
+    )
+
+
+async def create_post() -> Post:
+    return await Post(
+        title = "Buffered reactions",
+        content = "Write-behind reactions",
+        author_id = PydanticObjectId()
+    ).insert()
+
+
+async def get_state(post_id: PydanticObjectId) -> Tuple[Dict[str, int], List[Optional[str]]]:
+    post: Post = await Post.get(post_id)
+
+    return (
+        {
+            reaction: count
+            for reaction, count in post.reactions.items()
+            if count
+        },
+        sorted(
+            post_reaction.reaction
+            for post_reaction in await PostReaction.find(PostReaction.post_id == post_id).to_list()
+        )
+    )
+
+
+def test_toggles_are_coalesced_into_final_state(run_with_db) -> None:
+    async def scenario() -> Tuple[int, int, Tuple[Dict[str, int], List[Optional[str]]]]:
+        buffer: ReactionsBuffer = build_buffer()
+        post: Post = await create_post()
+        user_id: PydanticObjectId = PydanticObjectId()
+        undecided_user_id: PydanticObjectId = PydanticObjectId()
+
+        for reaction in [LIKE, DISLIKE, None, LIKE, DISLIKE]:
+            await buffer.record(user_id, post.id, reaction)
+
+        # Ends where it started, so there is nothing to write for this user
+        for reaction in [LIKE, None]:
+            await buffer.record(undecided_user_id, post.id, reaction)
+
+        pending_count: int = len(buffer)
+        written_count: int = await buffer.flush()
+
+        return pending_count, written_count, await get_state(post.id)
+
+    pending_count, written_count, state = run_with_db(scenario)
+
+    assert pending_count == 2
+    assert written_count == 1
+    assert state == ({DISLIKE: 1}, [DISLIKE])
+
+
+def test_pending_changes_are_flushed_on_shutdown(run_with_db) -> None:
+    async def scenario() -> Tuple[int, Tuple[Dict[str, int], List[Optional[str]]]]:
+        buffer: ReactionsBuffer = build_buffer()
+        post: Post = await create_post()
+
+        await buffer.start()
+
+        for _ in range(3):
+            await buffer.record(PydanticObjectId(), post.id, LIKE)
+
+        await buffer.shutdown()
+
+        return len(buffer), await get_state(post.id)
+
+    pending_count, state = run_with_db(scenario)
+
+    assert pending_count == 0
+    assert state == ({LIKE: 3}, [LIKE, LIKE, LIKE])
+
+
+def test_overlay_shows_own_pending_changes(run_with_db) -> None:
+    async def scenario() -> Tuple[Dict[PydanticObjectId, str], Dict[PydanticObjectId, str], List[PydanticObjectId]]:
+        buffer: ReactionsBuffer = build_buffer()
+        user_id: PydanticObjectId = PydanticObjectId()
+        posts: List[Post] = [
+            await create_post()
+            for _ in range(3)
+        ]
+
+        # The second post already has a written reaction, which is removed while buffered
+        await buffer.record(user_id, posts[1].id, LIKE)
+        await buffer.flush()
+
+        await buffer.record(user_id, posts[0].id, DISLIKE)
+        await buffer.record(user_id, posts[1].id, None)
+
+        post_ids: List[PydanticObjectId] = [
+            post.id
+            for post in posts
+        ]
+
+        stored_reactions: Dict[PydanticObjectId, str] = {
+            post_reaction.post_id: post_reaction.reaction
+            for post_reaction in await PostReaction.find(PostReaction.user_id == user_id).to_list()
+        }
+
+        return (
+            buffer.overlay_user_reactions(user_id, post_ids, dict(stored_reactions)),
+            buffer.overlay_user_reactions(PydanticObjectId(), post_ids, {}),
+            post_ids
+        )
+
+    user_reactions, other_user_reactions, post_ids = run_with_db(scenario)
+
+    assert user_reactions == {
+        post_ids[0]: DISLIKE
+    }
+    assert other_user_reactions == {}
@@ -0,0 +1,119 @@
+from asyncio import Event, gather, run
+
+from app.response_cache import (
+    CachedResponse, MemoryResponseCacheBackend, POSTS_LIST_CACHE_TAG, get_post_cache_tag
+)
+
+from typing import Optional
+
+
+CACHE_KEY: str = "posts:list?limit=10"
+
+STALE_RESPONSE: CachedResponse = CachedResponse(
+    content = b'{"posts": [{"title": "old"}]}',
+    headers = {}
+)
+
+
+def build_backend(max_size: int=16) -> MemoryResponseCacheBackend:
+    return MemoryResponseCacheBackend(
+        max_size = max_size,
+        ttl = 60
+    )
+
+
+def test_fill_racing_with_write_is_not_stored() -> None:
+    async def scenario() -> Optional[CachedResponse]:
+        backend: MemoryResponseCacheBackend = build_backend()
+        is_read_done: Event = Event()
+        is_written: Event = Event()
+
+        async def reader() -> None:
+            generation: int = await backend.get_generation()
+
+            # The database read happens here and returns the old post
+            is_read_done.set()
+            await is_written.wait()
+
+            await backend.set(
+                key = CACHE_KEY,
+                value = STALE_RESPONSE,
+                tags = [
+                    POSTS_LIST_CACHE_TAG,
+                    get_post_cache_tag("post")
+                ],
+                generation = generation
+            )
+
+        async def writer() -> None:
+            await is_read_done.wait()
+
+            # The write commits after the read and invalidates before the reader fills the cache
+            await backend.invalidate_tags([
+                get_post_cache_tag("post")
+            ])
+
+            is_written.set()
+
+        await gather(reader(), writer())
+
+        return await backend.get(CACHE_KEY)
+
+    assert run(scenario()) is None
+
+
+def test_fill_is_stored_without_concurrent_write() -> None:
+    async def scenario() -> Optional[CachedResponse]:
+        backend: MemoryResponseCacheBackend = build_backend()
+
+        await backend.invalidate_tags([
+            get_post_cache_tag("post")
+        ])
+
+        generation: int = await backend.get_generation()
+
+        # Invalidations of other tags do not affect this entry
+        await backend.invalidate_tags([
+            get_post_cache_tag("other")
+        ])
+
+        await backend.set(
+            key = CACHE_KEY,
+            value = STALE_RESPONSE,
+            tags = [
+                POSTS_LIST_CACHE_TAG,
+                get_post_cache_tag("post")
+            ],
+            generation = generation
+        )
+
+        return await backend.get(CACHE_KEY)
+
+    assert run(scenario()) == STALE_RESPONSE
+
+
+def test_fill_older_than_forgotten_tags_is_not_stored() -> None:
+    async def scenario() -> Optional[CachedResponse]:
+        backend: MemoryResponseCacheBackend = build_backend(
+            max_size = 2
+        )
+
+        generation: int = await backend.get_generation()
+
+        for index in range(3):
+            await backend.invalidate_tags([
+                get_post_cache_tag(index)
+            ])
+
+        await backend.set(
+            key = CACHE_KEY,
+            value = STALE_RESPONSE,
+            tags = [
+                get_post_cache_tag(0)
+            ],
+            generation = generation
+        )
+
+        return await backend.get(CACHE_KEY)
+
+    assert run(scenario()) is None
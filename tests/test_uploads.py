@@ -0,0 +1,166 @@
+import pytest
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from asyncio import run
+from io import BytesIO
+from json import loads as json_loads
+from pathlib import Path
+from time import perf_counter
+
+from app.uploads import RequestBodyLimitMiddleware, stream_upload_file, UPLOAD_CHUNK_SIZE
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+MAX_SIZE: int = 4 * UPLOAD_CHUNK_SIZE
+BOUNDARY: str = "pyblog-test-boundary"
+
+
+def build_upload_app() -> Tuple[FastAPI, List[int]]:
+    upload_app: FastAPI = FastAPI()
+    uploaded_sizes: List[int] = []
+
+    @upload_app.post("/upload")
+    async def upload_route(file: UploadFile = File()) -> dict:
+        uploaded_sizes.append(len(await file.read()))
+
+        return {}
+
+    upload_app.add_middleware(
+        RequestBodyLimitMiddleware,
+        max_size = MAX_SIZE
+    )
+
+    return upload_app, uploaded_sizes
+
+
+def build_multipart_chunks(file_size: int) -> List[bytes]:
+    body: bytes = (
+        f"--{BOUNDARY}\r\n"
+        "Content-Disposition: form-data; name=\"file\"; filename=\"image.png\"\r\n"
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + b"\0" * file_size + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    return [
+        body[index:index + UPLOAD_CHUNK_SIZE]
+        for index in range(0, len(body), UPLOAD_CHUNK_SIZE)
+    ]
+
+
+async def post_chunks(app: FastAPI, chunks: List[bytes], content_length: Optional[int]) -> Tuple[int, dict, int]:
+    """Posts `chunks` as a multipart body, returns the status, the JSON body and how many chunks the app read."""
+
+    headers: List[Tuple[bytes, bytes]] = [
+        (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())
+    ]
+
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+
+    scope: Dict[str, Any] = {
+        "type": "http",
+        "asgi": {
+            "version": "3.0"
+        },
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/upload",
+        "raw_path": b"/upload",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("test", 80)
+    }
+
+    read_chunks_count: int = 0
+    response: Dict[str, Any] = {
+        "body": b""
+    }
+
+    async def receive() -> dict:
+        nonlocal read_chunks_count
+
+        if read_chunks_count >= len(chunks):
+            return {
+                "type": "http.disconnect"
+            }
+
+        read_chunks_count += 1
+
+        return {
+            "type": "http.request",
+            "body": chunks[read_chunks_count - 1],
+            "more_body": read_chunks_count < len(chunks)
+        }
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+        else:
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+
+    return response["status"], json_loads(response["body"]), read_chunks_count
+
+
+def test_upload_under_limit_passes() -> None:
+    upload_app, uploaded_sizes = build_upload_app()
+    chunks: List[bytes] = build_multipart_chunks(MAX_SIZE // 2)
+
+    status_code, _, _ = run(post_chunks(upload_app, chunks, sum(map(len, chunks))))
+
+    assert status_code == 200
+    assert uploaded_sizes == [MAX_SIZE // 2]
+
+
+def test_declared_oversized_upload_is_rejected_unread() -> None:
+    upload_app, uploaded_sizes = build_upload_app()
+    chunks: List[bytes] = build_multipart_chunks(MAX_SIZE * 64)
+
+    status_code, response_body, read_chunks_count = run(post_chunks(upload_app, chunks, sum(map(len, chunks))))
+
+    assert status_code == 413
+    assert response_body == {"detail": "FILE_TOO_LARGE"}
+    assert read_chunks_count == 0
+    assert not uploaded_sizes
+
+
+def test_chunked_oversized_upload_stops_at_limit() -> None:
+    upload_app, uploaded_sizes = build_upload_app()
+    chunks: List[bytes] = build_multipart_chunks(MAX_SIZE * 64)
+
+    started_at: float = perf_counter()
+
+    status_code, response_body, read_chunks_count = run(post_chunks(upload_app, chunks, None))
+
+    elapsed: float = perf_counter() - started_at
+
+    assert status_code == 413
+    assert response_body == {"detail": "FILE_TOO_LARGE"}
+    # Reading stops right after the limit instead of parsing the whole 16 MiB body
+    assert read_chunks_count <= MAX_SIZE // UPLOAD_CHUNK_SIZE + 1
+    assert elapsed < 1
+    assert not uploaded_sizes
+
+
+def test_stream_upload_file_rejects_oversized_file(tmp_path: Path) -> None:
+    filepath: Path = tmp_path / "upload"
+
+    upload_file: UploadFile = UploadFile(
+        file = BytesIO(b"\0" * (MAX_SIZE + 1)),
+        filename = "image.png"
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        run(stream_upload_file(
+            upload_file = upload_file,
+            filepath = filepath,
+            max_size = MAX_SIZE
+        ))
+
+    assert exc_info.value.status_code == 413
+    assert not filepath.exists()
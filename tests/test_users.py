@@ -0,0 +1,49 @@
+import pytest
+
+from fastapi_users.exceptions import UserAlreadyExists
+from fastapi_users_db_beanie import BeanieUserDatabase
+
+from app.db import User
+from app.schemas import UserCreate, UserUpdate
+from app.auth_backend import UserManager
+
+
+def build_user_create(username: str) -> UserCreate:
+    return UserCreate(
+        username = username,
+        email = f"{username.lower()}-{id(username)}@example.com",
+        password = "password"
+    )
+
+
+def test_usernames_differing_in_case_are_refused(run_with_db) -> None:
+    async def scenario() -> None:
+        user_manager: UserManager = UserManager(
+            user_db = BeanieUserDatabase(User)
+        )
+
+        await user_manager.create(build_user_create("Bob"))
+        alice: User = await user_manager.create(build_user_create("alice"))
+
+        with pytest.raises(UserAlreadyExists):
+            await user_manager.create(build_user_create("bob"))
+
+        with pytest.raises(UserAlreadyExists):
+            await user_manager.update(
+                UserUpdate(
+                    username = "BOB"
+                ),
+                alice
+            )
+
+        # Changing only the case of one's own username is fine
+        alice = await user_manager.update(
+            UserUpdate(
+                username = "Alice"
+            ),
+            alice
+        )
+
+        assert alice.username == "Alice"
+
+    run_with_db(scenario)